@@ -1,15 +1,102 @@
-from collections.abc import Generator
-from sqlmodel import Session, create_engine, SQLModel, Session
+import os
+from collections.abc import AsyncGenerator, Generator
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-DATABASE_URL = "sqlite:///./database.db"
-engine = create_engine(DATABASE_URL, echo=True)
+load_dotenv()
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database.db")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+# Server databases (PostgreSQL): pooled connections shared by the worker's threads.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite: WAL lets readers run alongside the single writer.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+def engine_options(url: str, echo: bool) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"echo": echo, "connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        "echo": echo,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def build_engine(url: str = DATABASE_URL, echo: bool = DB_ECHO):
+    options = engine_options(url, echo)
+    if make_url(url).get_backend_name() == "sqlite":
+        options["connect_args"]["check_same_thread"] = False
+        engine = create_engine(url, **options)
+        event.listen(engine, "connect", tune_sqlite)
+        return engine
+    return create_engine(url, **options)
+
+
+def async_url(url: str) -> str:
+    """The same database reached through an asyncio driver."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend == "postgresql" and parsed.get_driver_name() in ("psycopg2", "psycopg", ""):
+        # psycopg 3 speaks both sync and async under the same dialect name.
+        return parsed.set(drivername="postgresql+psycopg").render_as_string(hide_password=False)
+    return url
+
+
+def build_async_engine(url: str = DATABASE_URL, echo: bool = DB_ECHO):
+    engine = create_async_engine(async_url(url), **engine_options(url, echo))
+    if make_url(url).get_backend_name() == "sqlite":
+        event.listen(engine.sync_engine, "connect", tune_sqlite)
+    return engine
+
+
+def tune_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+engine = build_engine()
+async_engine = build_async_engine()
+async_session = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+ALEMBIC_CONFIG = Path(__file__).resolve().parents[1] / "alembic.ini"
+
+def run_migrations():
+    """Upgrade the schema to the latest Alembic revision."""
+    config = Config(str(ALEMBIC_CONFIG))
+    # Keep the app's logging setup instead of alembic.ini's.
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
 
 def get_db() -> Generator[Session, None, None]:
     with Session(engine) as session:
         try:
             yield session
         finally:
-            session.close
\ No newline at end of file
+            session.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session() as session:
+        yield session
@@ -1,13 +1,38 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import system_operator, market_data, user, genco_dashboard, disco_dashboard, web_socket
-from db.db import create_db_and_tables
+from routes import system_operator, market_data, user, genco_dashboard, disco_dashboard, web_socket, cache, metrics
+from db.db import run_migrations, async_engine, engine
+from modules.trigger_match import TriggerMatch
+from modules.shard_match import ShardedMatch
+from modules.broker import build_broker
+from modules.websocket_connection import manager
+from modules.countdown import countdown
+from modules.order_book import order_book
+from modules.clearing import clearing_jobs
+from modules.metrics import MetricsMiddleware, instrument_engine
 
 app = FastAPI(title="Onction Disco dashboard", version="1.0.0")
+instrument_engine(engine)
+instrument_engine(async_engine)
 
 @app.on_event("startup")
 def on_startup():
-    create_db_and_tables()
+    run_migrations()
+
+@app.on_event("startup")
+async def start_websocket_broker():
+    await manager.start(build_broker())
+    await countdown.start()
+    await order_book.start(engine)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await clearing_jobs.close()
+    await countdown.stop()
+    await manager.close()
+    await TriggerMatch.aclose()
+    ShardedMatch.shutdown()
+    await async_engine.dispose()
 
 app.include_router(system_operator.router)
 app.include_router(genco_dashboard.router)
@@ -15,8 +40,11 @@ app.include_router(disco_dashboard.router)
 app.include_router(market_data.router)
 app.include_router(user.router)
 app.include_router(web_socket.router)
+app.include_router(cache.router)
+app.include_router(metrics.router)
 
 
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -0,0 +1,76 @@
+"""Initial schema.
+
+Databases created by the old ``create_all`` at startup already have these
+tables; they are left untouched and simply stamped at this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+STATUS = sa.Enum("PENDING", "MATCHED", "REJECTED", "APPROVED", "DENIED", name="status")
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "order" not in existing:
+        op.create_table(
+            "order",
+            sa.Column("common_name", sqlmodel.AutoString(), nullable=False),
+            sa.Column("trader_id", sqlmodel.AutoString(), nullable=False),
+            sa.Column("order_type", sqlmodel.AutoString(), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("price", sa.Float(), nullable=False),
+            sa.Column("timeslot", sqlmodel.AutoString(), nullable=False),
+            sa.Column("delivery_day", sa.Date(), nullable=False),
+            sa.Column("max_dispatch", sa.Integer(), nullable=False),
+            sa.Column("quantity_filled", sa.Integer(), nullable=False),
+            sa.Column("order_ref", sa.Uuid(), nullable=False),
+            sa.Column("fully_matched", sa.Boolean(), nullable=True),
+            sa.Column("status", STATUS, nullable=True),
+            sa.PrimaryKeyConstraint("order_ref"),
+        )
+
+    if "trades" not in existing:
+        op.create_table(
+            "trades",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("matching_id", sa.Uuid(), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("trade_id", sa.Uuid(), nullable=False),
+            sa.Column("buyer_order_ref", sa.Uuid(), nullable=False),
+            sa.Column("buyer_id", sqlmodel.AutoString(), nullable=False),
+            sa.Column("timeslot", sa.Time(), nullable=False),
+            sa.Column("seller_order_ref", sa.Uuid(), nullable=False),
+            sa.Column("seller_id", sqlmodel.AutoString(), nullable=False),
+            sa.Column("price", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("delivery_day", sa.Date(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+    if "submissionwindow" not in existing:
+        op.create_table(
+            "submissionwindow",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("open_time", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("close_time", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+
+
+def downgrade():
+    op.drop_table("submissionwindow")
+    op.drop_table("trades")
+    op.drop_table("order")
+    STATUS.drop(op.get_bind(), checkfirst=True)
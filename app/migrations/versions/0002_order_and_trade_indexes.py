@@ -0,0 +1,31 @@
+"""Indexes for clearing, dashboard and trade listing queries.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_order_delivery_day_timeslot_type_price", "order",
+                    ["delivery_day", "timeslot", "order_type", "price"])
+    op.create_index("ix_order_trader_id_delivery_day", "order", ["trader_id", "delivery_day"])
+    op.create_index("ix_trades_buyer_id_seller_id", "trades", ["buyer_id", "seller_id"])
+    op.create_index("ix_trades_seller_id", "trades", ["seller_id"])
+    op.create_index("ix_trades_delivery_day_timeslot", "trades", ["delivery_day", "timeslot"])
+    op.create_index("ix_trades_created_at_id", "trades", ["created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_trades_created_at_id", table_name="trades")
+    op.drop_index("ix_trades_delivery_day_timeslot", table_name="trades")
+    op.drop_index("ix_trades_seller_id", table_name="trades")
+    op.drop_index("ix_trades_buyer_id_seller_id", table_name="trades")
+    op.drop_index("ix_order_trader_id_delivery_day", table_name="order")
+    op.drop_index("ix_order_delivery_day_timeslot_type_price", table_name="order")
@@ -0,0 +1,33 @@
+"""Rollup table for market data.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "market_summary",
+        sa.Column("delivery_day", sa.Date(), nullable=False),
+        sa.Column("timeslot", sqlmodel.AutoString(), nullable=False),
+        sa.Column("price", sa.Float(), nullable=True),
+        sa.Column("volume", sa.Integer(), nullable=False),
+        sa.Column("trades", sa.Integer(), nullable=False),
+        sa.Column("demand", sa.Integer(), nullable=False),
+        sa.Column("supply", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("delivery_day", "timeslot"),
+    )
+
+
+def downgrade():
+    op.drop_table("market_summary")
@@ -0,0 +1,46 @@
+"""Background clearing jobs.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+ACTIVE_JOB = "status IN ('queued', 'running')"
+
+
+def upgrade():
+    op.create_table(
+        "clearing_job",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("delivery_day", sa.Date(), nullable=False),
+        sa.Column("sharded", sa.Boolean(), nullable=False),
+        sa.Column("status", sqlmodel.AutoString(), nullable=False),
+        sa.Column("stage", sqlmodel.AutoString(), nullable=True),
+        sa.Column("trades", sa.Integer(), nullable=True),
+        sa.Column("error", sqlmodel.AutoString(), nullable=True),
+        sa.Column("error_status", sa.Integer(), nullable=True),
+        sa.Column("timings", sa.JSON(), nullable=True),
+        sa.Column("worker", sqlmodel.AutoString(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_clearing_job_delivery_day", "clearing_job", ["delivery_day"])
+    op.create_index("ux_clearing_job_active_day", "clearing_job", ["delivery_day"], unique=True,
+                    sqlite_where=sa.text(ACTIVE_JOB), postgresql_where=sa.text(ACTIVE_JOB))
+
+
+def downgrade():
+    op.drop_index("ux_clearing_job_active_day", table_name="clearing_job")
+    op.drop_index("ix_clearing_job_delivery_day", table_name="clearing_job")
+    op.drop_table("clearing_job")
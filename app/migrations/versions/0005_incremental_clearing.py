@@ -0,0 +1,38 @@
+"""Order revisions, clearing versions and unique trade ids for re-clearing.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+UNCLEARED_ORDER = "cleared_revision IS NULL OR cleared_revision < revision"
+
+
+def upgrade():
+    op.add_column("order", sa.Column("revision", sa.Integer(), nullable=False, server_default="1"))
+    op.add_column("order", sa.Column("cleared_revision", sa.Integer(), nullable=True))
+    op.create_index("ix_order_uncleared_delivery_day", "order", ["delivery_day", "timeslot"],
+                    sqlite_where=sa.text(UNCLEARED_ORDER), postgresql_where=sa.text(UNCLEARED_ORDER))
+    op.add_column("clearing_job", sa.Column("version", sa.Integer(), nullable=True))
+    op.add_column("clearing_job", sa.Column("orders", sa.Integer(), nullable=True))
+    # Keep the first copy of any trade saved twice before making trade_id unique.
+    op.execute("DELETE FROM trades WHERE id NOT IN (SELECT MIN(id) FROM trades GROUP BY trade_id)")
+    op.create_index("ux_trades_trade_id", "trades", ["trade_id"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ux_trades_trade_id", table_name="trades")
+    with op.batch_alter_table("clearing_job") as batch:
+        batch.drop_column("orders")
+        batch.drop_column("version")
+    op.drop_index("ix_order_uncleared_delivery_day", table_name="order")
+    with op.batch_alter_table("order") as batch:
+        batch.drop_column("cleared_revision")
+        batch.drop_column("revision")
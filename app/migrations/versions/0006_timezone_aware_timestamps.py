@@ -0,0 +1,46 @@
+"""Timezone-aware clearing job and market summary timestamps.
+
+The models declare these as aware datetimes, like ``trades.created_at``,
+but 0003 and 0004 created them without a time zone. PostgreSQL then
+converted every UTC value to the session's time zone and dropped the
+offset.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# (table, column, nullable)
+TIMESTAMPS = (
+    ("clearing_job", "created_at", False),
+    ("clearing_job", "started_at", True),
+    ("clearing_job", "finished_at", True),
+    ("clearing_job", "heartbeat_at", False),
+    ("market_summary", "updated_at", False),
+)
+
+
+def upgrade():
+    # SQLite stores both kinds as text; only PostgreSQL has two column types.
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, column, nullable in TIMESTAMPS:
+        # The stored values are local times of the session that wrote them,
+        # which is how the cast to timestamptz reads them.
+        op.alter_column(table, column, type_=sa.DateTime(timezone=True), existing_type=sa.DateTime(),
+                        existing_nullable=nullable)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, column, nullable in TIMESTAMPS:
+        op.alter_column(table, column, type_=sa.DateTime(), existing_type=sa.DateTime(timezone=True),
+                        existing_nullable=nullable)
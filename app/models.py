@@ -1,9 +1,10 @@
 from pydantic import BaseModel, validator
 from sqlmodel import SQLModel, Field
+from sqlalchemy import JSON, Column, Index, text
 import uuid 
 from enum import Enum
 from datetime import date, time,  datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class Status(str, Enum):
     PENDING: str = "pending"
@@ -39,7 +40,19 @@ class Create(SQLModel):
     quantity_filled: int
     # created_by: Optional[str] = None
 
+# Orders added or amended since the last clearing of their day.
+UNCLEARED_ORDER = "cleared_revision IS NULL OR cleared_revision < revision"
+
 class Order(Create, table=True):
+    __table_args__ = (
+        # Clearing payloads and order-book reads for one auction.
+        Index("ix_order_delivery_day_timeslot_type_price", "delivery_day", "timeslot", "order_type", "price"),
+        # Per-trader dashboards.
+        Index("ix_order_trader_id_delivery_day", "trader_id", "delivery_day"),
+        # What an incremental re-clearing has to resend.
+        Index("ix_order_uncleared_delivery_day", "delivery_day", "timeslot",
+              sqlite_where=text(UNCLEARED_ORDER), postgresql_where=text(UNCLEARED_ORDER)),
+    )
     order_ref: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     common_name: str
     trader_id: str 
@@ -52,10 +65,13 @@ class Order(Create, table=True):
     max_dispatch: int
     quantity_filled: int
     status: Optional[Status] = Status.PENDING
+    # Bumped by every amendment; the clearing that sees an order records the
+    # revision it saw, so re-clearing the day only resends what changed.
+    revision: int = 1
+    cleared_revision: Optional[int] = None
     # created_by: Optional[str]
 
-class Trades(SQLModel, table=True):
-    id: Optional[int] = Field(default_factory=uuid.uuid4, primary_key=True)
+class TradeBase(SQLModel):
     matching_id: uuid.UUID 
     quantity: int
     trade_id: uuid.UUID
@@ -68,6 +84,19 @@ class Trades(SQLModel, table=True):
     created_at: datetime
     delivery_day: date
 
+class Trades(TradeBase, table=True):
+    __table_args__ = (
+        # Buyer dashboards and buyer/seller pair lookups.
+        Index("ix_trades_buyer_id_seller_id", "buyer_id", "seller_id"),
+        Index("ix_trades_seller_id", "seller_id"),
+        Index("ix_trades_delivery_day_timeslot", "delivery_day", "timeslot"),
+        # Keyset pagination of the trade listing.
+        Index("ix_trades_created_at_id", "created_at", "id"),
+        # A trade is stored once, however often its clearing result is saved.
+        Index("ux_trades_trade_id", "trade_id", unique=True),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+
 class ShowOrder(Order):
     pass
 
@@ -87,8 +116,80 @@ class Update(Create):
 class Message(BaseModel):
     message: str
 
+class IngestMode(str, Enum):
+    ALL_OR_NOTHING: str = "all_or_nothing"
+    BEST_EFFORT: str = "best_effort"
+
+class RowError(BaseModel):
+    row: int
+    error: str
+
+class BulkOrderResult(BaseModel):
+    inserted: int
+    order_refs: List[uuid.UUID] = []
+    rejected: List[RowError] = []
+
+class UploadResult(BaseModel):
+    rows: int
+    inserted: int
+    rejected_count: int
+    rejected: List[RowError] = []
+    seconds: float
+    rows_per_second: float
+    # Last row number committed; a failed upload resumes after it.
+    last_row: Optional[int] = None
+    error: Optional[str] = None
+
+class MarketSummary(SQLModel, table=True):
+    """Per-auction totals behind ``/market-data/``, refreshed after each clearing."""
+    __tablename__ = "market_summary"
+    delivery_day: date = Field(primary_key=True)
+    timeslot: str = Field(primary_key=True)
+    price: Optional[float] = None
+    volume: int = 0
+    trades: int = 0
+    demand: int = 0
+    supply: int = 0
+    updated_at: datetime
+
 class SubmissionWindow(SQLModel, table=True):
     id: int = Field(default=None, primary_key=True)
     open_time: datetime
     close_time: datetime
-    is_active: bool = Field(default=True)
\ No newline at end of file
+    is_active: bool = Field(default=True)
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+ACTIVE_JOB = "status IN ('queued', 'running')"
+
+class ClearingJob(SQLModel, table=True):
+    """One background run of ``trigger_matching_engine`` for a delivery day."""
+    __tablename__ = "clearing_job"
+    __table_args__ = (
+        # At most one queued or running clearing per day, across all workers.
+        Index("ux_clearing_job_active_day", "delivery_day", unique=True,
+              sqlite_where=text(ACTIVE_JOB), postgresql_where=text(ACTIVE_JOB)),
+    )
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    delivery_day: date = Field(index=True)
+    sharded: bool = False
+    status: str = JobStatus.QUEUED.value
+    stage: Optional[str] = None
+    # The day's clearing version this run produced (the current one when
+    # nothing had changed), and how many orders it sent to the engine.
+    version: Optional[int] = None
+    orders: Optional[int] = None
+    trades: Optional[int] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+    # Seconds per stage, "total", and the shard breakdown of sharded runs.
+    timings: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    worker: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    heartbeat_at: datetime
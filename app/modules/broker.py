@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Optional
+
+Deliver = Callable[[str, str], None]
+logger = logging.getLogger(__name__)
+
+
+class MemoryBroker():
+    """Delivers published messages straight back to this process.
+
+    The default: enough for a single worker, and what every worker falls
+    back to when no ``BROKER_URL`` is configured.
+    """
+
+    def __init__(self):
+        self.deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def publish(self, topic: str, message: str):
+        if self.deliver is not None:
+            self.deliver(topic, message)
+
+    async def close(self):
+        self.deliver = None
+
+
+class RedisBroker():
+    """Relays messages between workers over Redis pub/sub.
+
+    Every topic maps to the channel ``{prefix}{topic}``. Each worker holds one
+    pattern subscription on ``{prefix}*`` and hands whatever arrives to its
+    local ``ConnectionManager``, which drops topics nobody on that worker
+    follows. A publish from any worker therefore reaches subscribers on all
+    of them, including the publisher's own.
+    """
+
+    def __init__(self, url: str, prefix: str = "onction:ws:", reconnect_delay: float = 1.0, connect_timeout: float = 5.0):
+        self.url = url
+        self.prefix = prefix
+        self.reconnect_delay = reconnect_delay
+        self.connect_timeout = connect_timeout
+        self.deliver: Optional[Deliver] = None
+        self.redis = None
+        self.listener: Optional[asyncio.Task] = None
+        self.ready = asyncio.Event()
+
+    async def start(self, deliver: Deliver):
+        # Imported here so the in-memory setup does not need the redis package.
+        from redis import asyncio as aioredis
+
+        self.deliver = deliver
+        self.redis = aioredis.from_url(self.url, decode_responses=True)
+        self.listener = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self.ready.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            # Keep serving local clients; the listener keeps retrying.
+            logger.warning("WebSocket broker at %s not reachable yet; retrying in the background", self.url)
+
+    async def publish(self, topic: str, message: str):
+        try:
+            await self.redis.publish(self.prefix + topic, message)
+        except Exception as error:
+            # Redis is down: this worker's own clients still get the message.
+            logger.warning("WebSocket broker publish failed: %s; delivering locally", error)
+            self.deliver(topic, message)
+
+    async def close(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+            self.listener = None
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    async def _listen(self):
+        start = len(self.prefix)
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(self.prefix + "*")
+                self.ready.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self.deliver(message["channel"][start:], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning("WebSocket broker connection lost: %s; reconnecting", error)
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await pubsub.aclose()
+
+
+def build_broker(url: Optional[str] = None):
+    url = url if url is not None else os.getenv("BROKER_URL", "")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url, prefix=os.getenv("BROKER_PREFIX", "onction:ws:"))
+    return MemoryBroker()
@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from sqlalchemy import func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from db.db import async_session
+from models import ClearingJob, JobStatus, Order
+from modules.events import publish_clearing
+from modules.local_match import LocalMatch
+from modules.market_data import refresh_market_summary
+from modules.metrics import time_matching
+from modules.order_book import PAYLOAD_FIELDS, book_entries
+from modules.response_cache import MARKET, TRADES, response_cache
+from modules.shard_match import ShardedMatch
+from modules.trade_store import save_clearing
+from modules.trigger_match import CircuitOpenError, TriggerMatch
+from modules.websocket_connection import clearing_topic, manager
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "remote" posts to the hosted engine, "local" clears in-process.
+MATCHING_ENGINE = os.getenv("MATCHING_ENGINE", "remote").strip().lower()
+# A queued or running job whose worker has not touched it for this long is
+# taken to be dead (worker killed mid-clearing) and no longer blocks its day.
+CLEARING_JOB_STALE_SECONDS = float(os.getenv("CLEARING_JOB_STALE_SECONDS", "900"))
+CLEARING_JOB_HEARTBEAT_SECONDS = float(os.getenv("CLEARING_JOB_HEARTBEAT_SECONDS", "30"))
+
+STAGES = ("loading", "matching", "saving", "summarizing", "publishing")
+ACTIVE = (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+
+jobs = ClearingJob.__table__
+orders = Order.__table__
+
+
+def matching_engine():
+    if MATCHING_ENGINE == "local":
+        return LocalMatch()
+    return TriggerMatch()
+
+
+def load_clearing_payload(session: Session, date: date, timeslots: Optional[Iterable[str]] = None) -> List[dict]:
+    """Open orders of ``date`` (of ``timeslots`` only, if given) as payload rows."""
+    query = select(*(orders.c[field] for field in PAYLOAD_FIELDS)).where(
+        orders.c.delivery_day == date,
+        or_(orders.c.fully_matched.is_(False), orders.c.fully_matched.is_(None)))
+    if timeslots is not None:
+        query = query.where(orders.c.timeslot.in_(list(timeslots)))
+    return book_entries(session.exec(query).all())
+
+
+def uncleared(columns):
+    """Orders added or amended since their day was last cleared: the
+    predicate of the ``ix_order_uncleared_delivery_day`` partial index."""
+    return or_(columns.cleared_revision.is_(None), columns.cleared_revision < columns.revision)
+
+
+def load_changed_payload(session: Session, date: date) -> Tuple[List[dict], List[Dict[str, Any]]]:
+    """The open book of every timeslot of ``date`` holding changed orders,
+    and the ``{"ref", "rev"}`` revisions that book accounts for.
+
+    Both come from one statement, so from one snapshot on every backend:
+    an order added or amended while the clearing runs is neither sent nor
+    marked cleared, and stays changed for the next clearing. The changed
+    orders of those slots that are already fully matched are not sent but
+    are marked cleared too; they cannot trade again.
+    """
+    changed_slots = select(orders.c.timeslot).where(orders.c.delivery_day == date, uncleared(orders.c))
+    rows = session.exec(
+        select(*(orders.c[field] for field in PAYLOAD_FIELDS), orders.c.revision, orders.c.cleared_revision)
+        .where(orders.c.delivery_day == date, orders.c.timeslot.in_(changed_slots))).all()
+    count, fully_matched = len(PAYLOAD_FIELDS), PAYLOAD_FIELDS.index("fully_matched")
+    payload = book_entries([row[:count] for row in rows if not row[fully_matched]])
+    cleared = [{"ref": row.order_ref, "rev": row.revision}
+               for row in rows if row.cleared_revision is None or row.cleared_revision < row.revision]
+    return payload, cleared
+
+
+def has_orders(session: Session, date: date) -> bool:
+    return session.exec(select(orders.c.order_ref).where(orders.c.delivery_day == date).limit(1)).first() is not None
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def clear_day(session, delivery_day: date, sharded: bool, stage) -> Tuple[List[Dict[str, Any]], Optional[list], int]:
+    """Load, match, persist and announce one day's clearing, incrementally.
+
+    Timeslots are independent auctions and each clearing leaves its slots
+    uncrossed, so only the slots holding orders added or amended since the
+    last clearing are sent, with their whole open book; a re-clear after a
+    few amendments costs those slots, and one with no changes costs a query.
+    The book comes from the database rather than this worker's in-memory
+    ``order_book``, which can miss orders other workers took, and only the
+    revisions it held are marked cleared.
+
+    ``stage(name)`` is awaited as each of ``STAGES`` begins. Returns the new
+    trades, the per-shard timings of sharded runs and the orders sent.
+    """
+    await stage("loading")
+    payload, cleared = await session.run_sync(load_changed_payload, delivery_day)
+    if not cleared:
+        if not await session.run_sync(has_orders, delivery_day):
+            raise HTTPException(status_code=404, detail=f"No orders for {delivery_day}")
+        logger.info("Clearing %s: no orders changed since the last clearing", delivery_day)
+        return [], None, 0
+    params = {"clearing_date": str(delivery_day)}
+
+    await stage("matching")
+    shards = None
+    data = []
+    if payload:
+        with time_matching(f"{MATCHING_ENGINE}{'-sharded' if sharded else ''}"):
+            if sharded:
+                data, shards = await ShardedMatch(matching_engine()).trigger_matching_engine(params, payload)
+            else:
+                data = await matching_engine().trigger_matching_engine(params, payload)
+    logger.info("Cleared %s: %d changed orders, %d orders sent -> %d trades",
+                delivery_day, len(cleared), len(payload), len(data or []))
+    if data is None:
+        raise HTTPException(status_code=404, detail=str(data))
+
+    await stage("saving")
+    trades, filled = await session.run_sync(save_clearing, data, cleared)
+    await stage("summarizing")
+    await session.run_sync(refresh_market_summary, {delivery_day})
+    await stage("publishing")
+    await response_cache.invalidate(TRADES, MARKET)
+    await publish_clearing(trades, filled)
+    return trades, shards, len(payload)
+
+
+def error_status(error: Exception) -> int:
+    if isinstance(error, CircuitOpenError):
+        return status.HTTP_503_SERVICE_UNAVAILABLE
+    if isinstance(error, HTTPException):
+        return error.status_code
+    return status.HTTP_400_BAD_REQUEST
+
+
+class ClearingJobs():
+    """Runs clearings as background tasks of the worker that accepted them.
+
+    Each job is a ``clearing_job`` row. A partial unique index allows one
+    queued or running job per delivery day, so a double-click, or two
+    workers, cannot start overlapping clearings. Progress goes to the
+    ``clearing.{day}`` topic as each stage starts and when the job ends;
+    the row keeps the stage, per-stage timings and the outcome.
+    """
+
+    def __init__(self):
+        self.worker = uuid.uuid4().hex
+        self.tasks: Dict[uuid.UUID, asyncio.Task] = {}
+
+    async def submit(self, delivery_day: date, sharded: bool = False) -> Tuple[ClearingJob, bool]:
+        """Queue a clearing; returns the job and whether it was created
+        (``False``: the day's active job, which blocked this one)."""
+        now = utc_now()
+        job = ClearingJob(delivery_day=delivery_day, sharded=sharded, worker=self.worker,
+                          created_at=now, heartbeat_at=now)
+        async with async_session() as session:
+            await session.execute(
+                update(jobs)
+                .where(jobs.c.delivery_day == delivery_day, jobs.c.status.in_(ACTIVE),
+                       jobs.c.heartbeat_at < now - timedelta(seconds=CLEARING_JOB_STALE_SECONDS))
+                .values(status=JobStatus.FAILED.value, error="Abandoned: its worker stopped responding",
+                        finished_at=now))
+            session.add(job)
+            try:
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                active = await session.exec(select(ClearingJob).where(
+                    ClearingJob.delivery_day == delivery_day, ClearingJob.status.in_(ACTIVE)))
+                existing = active.first()
+                if existing is None:
+                    raise
+                return existing, False
+            await session.refresh(job)
+
+        await self._announce(job)
+        # No await from here to the caller, so ``wait`` still finds the task.
+        task = asyncio.create_task(self._run(job))
+        self.tasks[job.id] = task
+        task.add_done_callback(lambda done: self._forget(job.id, done))
+        return job, True
+
+    async def wait(self, job_id: uuid.UUID) -> Tuple[List[Dict[str, Any]], Optional[list]]:
+        """The trades of a job running on this worker; raises what the clearing raised."""
+        return await asyncio.shield(self.tasks[job_id])
+
+    async def get(self, session, job_id: uuid.UUID) -> Optional[ClearingJob]:
+        return await session.get(ClearingJob, job_id)
+
+    async def recent(self, session, delivery_day: Optional[date] = None, limit: int = 20) -> List[ClearingJob]:
+        query = select(ClearingJob).order_by(ClearingJob.created_at.desc()).limit(limit)
+        if delivery_day is not None:
+            query = query.where(ClearingJob.delivery_day == delivery_day)
+        return (await session.exec(query)).all()
+
+    async def close(self):
+        """Stop this worker's jobs; they are recorded as failed."""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: ClearingJob):
+        timings: Dict[str, Any] = {}
+        started = perf_counter()
+        current: Dict[str, Any] = {"stage": None, "at": started}
+
+        def lap():
+            now = perf_counter()
+            if current["stage"] is not None:
+                timings[current["stage"]] = round(now - current["at"], 6)
+            current["at"] = now
+
+        async def stage(name: str):
+            lap()
+            current["stage"] = name
+            await self._update(job, stage=name, timings=dict(timings))
+
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._update(job, status=JobStatus.RUNNING.value, started_at=utc_now())
+            async with async_session() as session:
+                trades, shards, sent = await clear_day(session, job.delivery_day, job.sharded, stage)
+                version = await session.run_sync(clearing_version, job.delivery_day)
+            lap()
+            timings["total"] = round(perf_counter() - started, 6)
+            if shards is not None:
+                timings["shards"] = shards
+            # Only one job per day is active, so the next version is ours alone.
+            if sent:
+                version += 1
+            await self._update(job, status=JobStatus.SUCCEEDED.value, stage=None, version=version or None,
+                               orders=sent, trades=len(trades), timings=timings, finished_at=utc_now())
+            return trades, shards
+        except asyncio.CancelledError:
+            lap()
+            await self._fail(job, "Interrupted: the worker shut down", status.HTTP_503_SERVICE_UNAVAILABLE,
+                             timings, started)
+            raise
+        except Exception as error:
+            logger.warning("Clearing %s for %s failed: %s", job.id, job.delivery_day, error)
+            detail = error.detail if isinstance(error, HTTPException) else str(error)
+            lap()
+            await self._fail(job, str(detail), error_status(error), timings, started)
+            raise
+        finally:
+            heartbeat.cancel()
+
+    async def _fail(self, job: ClearingJob, error: str, code: int, timings: Dict[str, Any], started: float):
+        timings["total"] = round(perf_counter() - started, 6)
+        await asyncio.shield(self._update(job, status=JobStatus.FAILED.value, error=error, error_status=code,
+                                          timings=timings, finished_at=utc_now()))
+
+    async def _heartbeat(self, job: ClearingJob):
+        while True:
+            await asyncio.sleep(CLEARING_JOB_HEARTBEAT_SECONDS)
+            try:
+                await self._update(job, announce=False)
+            except Exception as error:
+                # A busy database only delays the heartbeat; the next one retries.
+                logger.warning("Clearing %s heartbeat failed: %s", job.id, error)
+
+    async def _update(self, job: ClearingJob, announce: bool = True, **values):
+        values["heartbeat_at"] = utc_now()
+        async with async_session() as session:
+            await session.execute(update(jobs).where(jobs.c.id == job.id).values(**values))
+            await session.commit()
+        for key, value in values.items():
+            setattr(job, key, value)
+        if announce:
+            await self._announce(job)
+
+    async def _announce(self, job: ClearingJob):
+        await manager.publish_json(clearing_topic(job.delivery_day), {
+            "type": "clearing.progress",
+            "job_id": str(job.id),
+            "delivery_day": str(job.delivery_day),
+            "status": job.status,
+            "stage": job.stage,
+            "progress": progress(job),
+            "trades": job.trades,
+            "error": job.error,
+            "timings": job.timings,
+        })
+
+    def _forget(self, job_id: uuid.UUID, task: asyncio.Task):
+        self.tasks.pop(job_id, None)
+        # Failures are on the job row; nobody has to await the task to see them.
+        if not task.cancelled():
+            task.exception()
+
+
+def clearing_version(session: Session, delivery_day: date) -> int:
+    """The day's latest clearing version, 0 before its first clearing."""
+    return session.exec(select(func.max(jobs.c.version)).where(jobs.c.delivery_day == delivery_day)).one() or 0
+
+
+def progress(job: ClearingJob) -> float:
+    """Share of the stages finished, 0..1."""
+    if job.status in (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value):
+        return 1.0
+    if job.stage not in STAGES:
+        return 0.0
+    return round(STAGES.index(job.stage) / len(STAGES), 2)
+
+
+clearing_jobs = ClearingJobs()
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlmodel import Session
+
+from db.db import engine
+from models import SubmissionWindow
+from modules.websocket_connection import WINDOW, manager
+
+# Internal topic carrying window edits to the countdown of every worker.
+WINDOW_CHANGED = "window.changed"
+
+
+def utc_naive(value: datetime) -> datetime:
+    # Windows are stored as naive UTC, like datetime.utcnow().
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def window_payload(window: Optional[SubmissionWindow]) -> Optional[dict]:
+    if window is None:
+        return None
+    return {"open_time": window.open_time.isoformat(), "close_time": window.close_time.isoformat()}
+
+
+class Countdown():
+    """One ticker per worker for every ``/ws/countdown`` subscriber.
+
+    The remaining time is computed and encoded once per tick and delivered to
+    the ``window`` topic on this worker; each worker ticks for its own
+    clients, so ticks never cross the broker. Window edits do, on
+    ``window.changed``, and wake the ticker straight away.
+    """
+
+    def __init__(self):
+        self.close_time: Optional[datetime] = None
+        self.changed = asyncio.Event()
+        self.ticker: Optional[asyncio.Task] = None
+
+    def load(self):
+        with Session(engine) as session:
+            window = session.get(SubmissionWindow, 1)
+            self.set_window(window_payload(window))
+
+    async def start(self):
+        manager.listen(WINDOW_CHANGED, self.on_change)
+        await asyncio.to_thread(self.load)
+        self.ticker = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.ticker is not None:
+            self.ticker.cancel()
+            try:
+                await self.ticker
+            except asyncio.CancelledError:
+                pass
+            self.ticker = None
+
+    def set_window(self, payload: Optional[dict]):
+        self.close_time = utc_naive(datetime.fromisoformat(payload["close_time"])) if payload else None
+        self.changed.set()
+
+    def on_change(self, message: str):
+        self.set_window(json.loads(message))
+
+    async def publish_change(self, window: Optional[SubmissionWindow]):
+        await manager.publish_json(WINDOW_CHANGED, window_payload(window))
+
+    def remaining(self) -> float:
+        if self.close_time is None:
+            return 0.0
+        return max(0.0, (self.close_time - datetime.utcnow()).total_seconds())
+
+    def message(self, remaining: Optional[float] = None) -> str:
+        remaining = self.remaining() if remaining is None else remaining
+        if remaining <= 0:
+            return json.dumps({"remaining": 0, "status": "closed"})
+        return json.dumps({"remaining": remaining, "status": "open"})
+
+    async def run(self):
+        while True:
+            self.changed.clear()
+            remaining = self.remaining()
+            if manager.subscribers(WINDOW):
+                manager.deliver(WINDOW, self.message(remaining))
+            # Tick on whole seconds of the remaining time, so the last tick
+            # lands on the close; once closed, sleep until the window changes.
+            timeout = None
+            if remaining > 0:
+                timeout = remaining % 1
+                if timeout < 0.05 and remaining > 1:
+                    timeout += 1
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+countdown = Countdown()
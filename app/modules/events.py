@@ -0,0 +1,79 @@
+from collections import defaultdict
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Union
+
+from models import Create, Order
+from modules.websocket_connection import manager, market_topic, trades_topic
+
+# Larger batches are announced by count only; clients re-read them once.
+MAX_EVENT_ORDERS = 1000
+
+ORDER_FIELDS = ("order_ref", "order_type", "common_name", "quantity", "price", "max_dispatch",
+                "quantity_filled", "status", "fully_matched", "delivery_day", "timeslot")
+
+
+def order_delta(order: Union[Order, Create, Dict[str, Any]]) -> Dict[str, Any]:
+    if not isinstance(order, dict):
+        order = order.model_dump()
+    return {field: order[field].value if isinstance(order[field], Enum) else order[field]
+            for field in ORDER_FIELDS if field in order}
+
+
+def trade_delta(trade: Dict[str, Any], side: str) -> Dict[str, Any]:
+    mine, other = ("buyer", "seller") if side == "BUY" else ("seller", "buyer")
+    return {
+        "trade_id": trade["trade_id"],
+        "side": side,
+        "order_ref": trade[f"{mine}_order_ref"],
+        "counterparty_order_ref": trade[f"{other}_order_ref"],
+        "quantity": trade["quantity"],
+        "price": trade["price"],
+        "delivery_day": trade["delivery_day"],
+        "timeslot": trade["timeslot"],
+    }
+
+
+async def publish_clearing(trades: List[Dict[str, Any]], orders: List[Dict[str, Any]]):
+    """Tell each trader about their new trades and order fills, and the
+    ``market.{delivery_day}`` topic about the volume cleared."""
+    by_trader = defaultdict(lambda: {"trades": [], "orders": []})
+    volume, counts = defaultdict(int), defaultdict(int)
+    for trade in trades:
+        by_trader[trade["buyer_id"]]["trades"].append(trade_delta(trade, "BUY"))
+        by_trader[trade["seller_id"]]["trades"].append(trade_delta(trade, "SELL"))
+        volume[trade["delivery_day"]] += trade["quantity"]
+        counts[trade["delivery_day"]] += 1
+    for order in orders:
+        by_trader[order["trader_id"]]["orders"].append({
+            "order_ref": order["order_ref"],
+            "quantity_filled": order["quantity_filled"],
+            "status": order["status"],
+            "fully_matched": order["fully_matched"],
+        })
+
+    for trader_id, delta in by_trader.items():
+        await manager.publish_json(trades_topic(trader_id), {"type": "clearing", **delta})
+    for delivery_day, quantity in volume.items():
+        await manager.publish_json(market_topic(delivery_day), {
+            "type": "clearing", "delivery_day": delivery_day, "trades": counts[delivery_day], "volume": quantity})
+
+
+async def publish_orders(trader_id: str, op: str, orders: Iterable[Any]):
+    """Order changes for one trader; ``op`` is created, updated or deleted."""
+    orders = list(orders)
+    if len(orders) > MAX_EVENT_ORDERS:
+        await publish_count(trader_id, op, len(orders))
+        return
+    await manager.publish_json(trades_topic(trader_id), {
+        "type": "orders", "op": op, "orders": [order_delta(order) for order in orders]})
+
+
+async def publish_count(trader_id: str, op: str, count: int):
+    await manager.publish_json(trades_topic(trader_id), {"type": "orders", "op": op, "count": count})
+
+
+async def publish_created(trader_id: str, orders: List[Dict[str, Any]]):
+    """Created orders as ``ingest_orders`` stored them (coerced types, new
+    ``order_ref``s)."""
+    if orders:
+        await publish_orders(trader_id, "created", orders)
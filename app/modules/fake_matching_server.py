@@ -0,0 +1,67 @@
+"""Stand-in for the remote matching engine, for exercising ``TriggerMatch`` offline.
+
+Serves ``POST /v1/match`` backed by ``LocalMatch``, in JSON or, by content
+type, the columnar format of ``modules.wire``. Latency and failures are
+injected from ``FAKE_MATCH_DELAY`` (seconds) and ``FAKE_MATCH_FAILURE_RATE``
+(0..1) at startup, or at runtime through ``PUT /v1/faults``; turning
+``columns`` off makes it answer columnar requests with 415, as an engine
+that only speaks JSON would::
+
+    uvicorn modules.fake_matching_server:app --port 8001
+    MATCHING_ENGINE_URL=http://127.0.0.1:8001/v1/match uvicorn main:app
+"""
+import asyncio
+import json
+import os
+import random
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+from modules import wire
+from modules.local_match import LocalMatch
+
+
+class Faults(BaseModel):
+    delay: float = float(os.getenv("FAKE_MATCH_DELAY", "0"))
+    failure_rate: float = float(os.getenv("FAKE_MATCH_FAILURE_RATE", "0"))
+    failure_status: int = status.HTTP_503_SERVICE_UNAVAILABLE
+    columns: bool = os.getenv("FAKE_MATCH_COLUMNS", "1") == "1"
+
+
+app = FastAPI(title="Fake matching engine")
+app.state.faults = Faults()
+app.state.calls = 0
+
+
+@app.put("/v1/faults")
+def set_faults(faults: Faults) -> Faults:
+    app.state.faults = faults
+    return faults
+
+
+@app.get("/v1/faults")
+def get_faults() -> Dict[str, Any]:
+    return {**app.state.faults.model_dump(), "calls": app.state.calls}
+
+
+@app.post("/v1/match")
+async def match(request: Request, clearing_date: Optional[str] = None) -> Any:
+    app.state.calls += 1
+    faults = app.state.faults
+    columns = request.headers.get("content-type", "").startswith(wire.COLUMNS_CONTENT_TYPE)
+    if columns and not (faults.columns and wire.available()):
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail=f"{wire.COLUMNS_CONTENT_TYPE} not accepted")
+    if faults.delay:
+        await asyncio.sleep(faults.delay)
+    if random.random() < faults.failure_rate:
+        raise HTTPException(status_code=faults.failure_status, detail="injected failure")
+
+    body = await request.body()
+    payload = wire.decode_rows(body, wire.PAYLOAD_SCHEMA) if columns else json.loads(body)
+    trades = await LocalMatch().trigger_matching_engine({"clearing_date": clearing_date}, payload)
+    if faults.columns and wire.available() and wire.COLUMNS_CONTENT_TYPE in request.headers.get("accept", ""):
+        return Response(wire.encode_rows(trades, wire.TRADE_SCHEMA), media_type=wire.COLUMNS_CONTENT_TYPE)
+    return trades
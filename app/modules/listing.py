@@ -0,0 +1,113 @@
+import base64
+import json
+import uuid
+from datetime import date, datetime, time
+from typing import Any, Iterator, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, or_, select
+from sqlmodel import Session
+
+from db.db import engine
+from models import Order, Status, Trades
+from modules.serialization import dumps
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+STREAM_BATCH_SIZE = 1000
+
+orders = Order.__table__
+trades = Trades.__table__
+
+
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=json_default).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as error:
+        raise ValueError("Invalid cursor") from error
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def trade_query(
+        cursor: Optional[str] = None,
+        delivery_day: Optional[date] = None,
+        timeslot: Optional[time] = None,
+        trader_id: Optional[str] = None,
+        buyer_id: Optional[str] = None,
+        seller_id: Optional[str] = None):
+    """Trades in (created_at, id) order, starting after ``cursor``."""
+    query = select(trades).order_by(trades.c.created_at, trades.c.id)
+    if delivery_day is not None:
+        query = query.where(trades.c.delivery_day == delivery_day)
+    if timeslot is not None:
+        query = query.where(trades.c.timeslot == timeslot)
+    if trader_id is not None:
+        query = query.where(or_(trades.c.buyer_id == trader_id, trades.c.seller_id == trader_id))
+    if buyer_id is not None:
+        query = query.where(trades.c.buyer_id == buyer_id)
+    if seller_id is not None:
+        query = query.where(trades.c.seller_id == seller_id)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        created_at = datetime.fromisoformat(created_at)
+        query = query.where(or_(
+            trades.c.created_at > created_at,
+            and_(trades.c.created_at == created_at, trades.c.id > last_id)))
+    return query
+
+
+def order_query(
+        cursor: Optional[str] = None,
+        delivery_day: Optional[date] = None,
+        timeslot: Optional[str] = None,
+        status: Optional[Status] = None,
+        trader_id: Optional[str] = None):
+    """Orders in order_ref order, starting after ``cursor``."""
+    query = select(orders).order_by(orders.c.order_ref)
+    if delivery_day is not None:
+        query = query.where(orders.c.delivery_day == delivery_day)
+    if timeslot is not None:
+        query = query.where(orders.c.timeslot == timeslot)
+    if status is not None:
+        query = query.where(orders.c.status == status)
+    if trader_id is not None:
+        query = query.where(orders.c.trader_id == trader_id)
+    if cursor:
+        (last_ref,) = decode_cursor(cursor)
+        query = query.where(orders.c.order_ref > uuid.UUID(last_ref))
+    return query
+
+
+def cursor_key(row, table) -> List[Any]:
+    if table is trades:
+        return [row.created_at, row.id]
+    return [row.order_ref]
+
+
+def fetch_page(session: Session, query, table, limit: int) -> Tuple[List[dict], Optional[str]]:
+    """One page of rows as dicts, plus the cursor for the next page (None on the last)."""
+    rows = session.execute(query.limit(limit + 1)).all()
+    next_cursor = encode_cursor(cursor_key(rows[limit - 1], table)) if len(rows) > limit else None
+    return [dict(zip(row._fields, row)) for row in rows[:limit]], next_cursor
+
+
+def iter_ndjson(query) -> Iterator[bytes]:
+    # The request-scoped session may be closed before the body is sent, so
+    # the stream opens its own and reads through a server-side cursor.
+    with Session(engine) as session:
+        result = session.execute(query.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE))
+        for batch in result.mappings().partitions():
+            yield b"".join(dumps(dict(row)) + b"\n" for row in batch)
+
+
+def ndjson_response(query) -> StreamingResponse:
+    return StreamingResponse(iter_ndjson(query), media_type="application/x-ndjson")
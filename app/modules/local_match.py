@@ -0,0 +1,118 @@
+import asyncio
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class LocalMatch():
+    """In-process uniform-price double auction.
+
+    Drop-in alternative to ``TriggerMatch``: takes the same clearing payload
+    (one dict per order) and returns trade dicts in the shape the remote
+    engine sends back, ready for ``Trades.model_validate``.
+    """
+
+    def __init__(self):
+        pass
+
+    async def trigger_matching_engine(self, params, payload):
+        return await asyncio.to_thread(self.match, payload)
+
+    def match(self, payload: List[Dict[str, Any]], matching_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        matching_id = matching_id or str(uuid.uuid4())
+        created_at = datetime.now(timezone.utc).isoformat()
+
+        slots = defaultdict(list)
+        for order in payload:
+            if order.get("fully_matched"):
+                continue
+            slots[(str(order["delivery_day"]), str(order["timeslot"]))].append(order)
+
+        trades = []
+        for (delivery_day, timeslot), orders in slots.items():
+            buyers, sellers, fills, price = self.clear_slot(orders)
+            trade_ids = _uuid4_strings(len(fills))
+            trades.extend({
+                "matching_id": matching_id,
+                "trade_id": trade_id,
+                "quantity": fill,
+                "price": price,
+                "buyer_order_ref": str(orders[buyer]["order_ref"]),
+                "buyer_id": orders[buyer]["trader_id"],
+                "seller_order_ref": str(orders[seller]["order_ref"]),
+                "seller_id": orders[seller]["trader_id"],
+                "timeslot": timeslot,
+                "delivery_day": delivery_day,
+                "created_at": created_at,
+            } for buyer, seller, fill, trade_id in zip(buyers, sellers, fills, trade_ids))
+        return trades
+
+    @staticmethod
+    def clear_slot(orders: List[Dict[str, Any]]) -> Tuple[List[int], List[int], List[int], int]:
+        """Clear one (delivery_day, timeslot) auction.
+
+        Bids are sorted by descending price and offers by ascending price
+        (ties keep submission order). Walking both cumulative curves at once,
+        every breakpoint of either curve starts a new fill between the bid and
+        offer covering that stretch of volume; fills stop where the bid price
+        drops below the offer price. All fills settle at the midpoint of the
+        marginal bid and offer. Returns the buyer and seller positions in
+        ``orders``, the fill quantities and the clearing price.
+        """
+        count = len(orders)
+        no_trades = ([], [], [], 0)
+        is_buy = np.fromiter((o["order_type"] == "BUY" for o in orders), bool, count)
+        price = np.fromiter((o["price"] for o in orders), np.float64, count)
+        quantity = np.fromiter((o["quantity"] for o in orders), np.int64, count)
+        max_dispatch = np.fromiter((o.get("max_dispatch") or 0 for o in orders), np.int64, count)
+        filled = np.fromiter((o.get("quantity_filled") or 0 for o in orders), np.int64, count)
+
+        limit = np.where(max_dispatch > 0, np.minimum(quantity, max_dispatch), quantity)
+        remaining = np.clip(limit - filled, 0, None)
+        live = remaining > 0
+
+        bid_idx = np.flatnonzero(is_buy & live)
+        offer_idx = np.flatnonzero(~is_buy & live)
+        if bid_idx.size == 0 or offer_idx.size == 0:
+            return no_trades
+
+        bid_idx = bid_idx[np.argsort(-price[bid_idx], kind="stable")]
+        offer_idx = offer_idx[np.argsort(price[offer_idx], kind="stable")]
+        bid_cum = np.cumsum(remaining[bid_idx])
+        offer_cum = np.cumsum(remaining[offer_idx])
+
+        volume = min(bid_cum[-1], offer_cum[-1])
+        ends = np.union1d(bid_cum[bid_cum <= volume], offer_cum[offer_cum <= volume])
+        starts = np.concatenate(([0], ends[:-1]))
+        bid_pos = np.searchsorted(bid_cum, starts, side="right")
+        offer_pos = np.searchsorted(offer_cum, starts, side="right")
+
+        crossed = price[bid_idx[bid_pos]] >= price[offer_idx[offer_pos]]
+        matched = crossed.size if crossed.all() else int(np.argmin(crossed))
+        if matched == 0:
+            return no_trades
+
+        last_bid = price[bid_idx[bid_pos[matched - 1]]]
+        last_offer = price[offer_idx[offer_pos[matched - 1]]]
+        clearing_price = int(round((last_bid + last_offer) / 2))
+
+        buyers = bid_idx[bid_pos[:matched]].tolist()
+        sellers = offer_idx[offer_pos[:matched]].tolist()
+        fills = (ends - starts)[:matched].tolist()
+        return buyers, sellers, fills, clearing_price
+
+
+def _uuid4_strings(count: int) -> List[str]:
+    """Random version-4 UUID strings, generated in one batch."""
+    raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    hexed = raw.tobytes().hex()
+    return [
+        f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+        for h in (hexed[i:i + 32] for i in range(0, 32 * count, 32))
+    ]
@@ -1,20 +1,130 @@
-from datetime import datetime, timedelta, time
-import random
-from typing import Any, List
+from collections import defaultdict
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlmodel import Session
+
+from models import MarketSummary, Order, Trades
+
+orders = Order.__table__
+trades = Trades.__table__
+summary = MarketSummary.__table__
+
+
+def slot_key(timeslot: Any) -> str:
+    # Orders keep the submitted string ("10:00" or "10:00:00"), trades a time.
+    try:
+        return time.fromisoformat(str(timeslot)).isoformat()
+    except ValueError:
+        return str(timeslot)
+
+
+def empty_slot() -> Dict[str, Any]:
+    return {"price": None, "volume": 0, "trades": 0, "demand": 0, "supply": 0}
+
+
+def add_submitted(session: Session, delivery_day: date, slots: Dict[str, Dict[str, Any]]):
+    """Add the day's demand and supply per timeslot to ``slots`` with one
+    ``GROUP BY`` answered from the (delivery_day, timeslot, ...) index."""
+    submitted = session.execute(
+        select(orders.c.timeslot, orders.c.order_type, func.sum(orders.c.quantity))
+        .where(orders.c.delivery_day == delivery_day)
+        .group_by(orders.c.timeslot, orders.c.order_type))
+    for timeslot, order_type, quantity in submitted:
+        slot = slots[slot_key(timeslot)]
+        slot["demand" if order_type == "BUY" else "supply"] += quantity or 0
+
+
+def aggregate_day(session: Session, delivery_day: date) -> List[Dict[str, Any]]:
+    """Clearing price, volume, demand and supply per timeslot of one day.
+
+    Two ``GROUP BY timeslot`` queries, each answered from the
+    (delivery_day, timeslot, ...) indexes, so the cost follows the size of
+    the day rather than the whole history. The price is the volume-weighted
+    average of the day's trades in that slot.
+    """
+    slots = defaultdict(empty_slot)
+
+    traded = session.execute(
+        select(trades.c.timeslot,
+               func.sum(trades.c.quantity),
+               func.sum(trades.c.price * trades.c.quantity),
+               func.count())
+        .where(trades.c.delivery_day == delivery_day)
+        .group_by(trades.c.timeslot))
+    for timeslot, volume, value, count in traded:
+        slot = slots[slot_key(timeslot)]
+        slot["volume"] += volume or 0
+        slot["trades"] += count
+        slot["value"] = slot.get("value", 0) + (value or 0)
+
+    add_submitted(session, delivery_day, slots)
+
+    rows = []
+    for timeslot in sorted(slots):
+        slot = slots[timeslot]
+        value = slot.pop("value", 0)
+        if slot["volume"]:
+            slot["price"] = round(value / slot["volume"], 2)
+        rows.append({"delivery_day": delivery_day, "timeslot": timeslot, **slot})
+    return rows
+
+
+def refresh_market_summary(session: Session, days: Iterable[Any]):
+    """Recompute the rollup rows of the given delivery days only."""
+    now = datetime.now(timezone.utc)
+    for delivery_day in {date.fromisoformat(str(day)) for day in days}:
+        rows = aggregate_day(session, delivery_day)
+        session.execute(delete(summary).where(summary.c.delivery_day == delivery_day))
+        if rows:
+            session.execute(insert(summary), [{**row, "updated_at": now} for row in rows])
+    session.commit()
+
+
+def latest_delivery_day(session: Session) -> Optional[date]:
+    return session.execute(select(func.max(orders.c.delivery_day))).scalar()
 
 
 class Marketdata():
     def __init__(self):
         pass
 
-    def generate_market_data(self, data) -> List[Any]:
+    def generate_market_data(self, session: Session, delivery_day: Optional[date] = None) -> List[Any]:
+        """Per-timeslot market data for ``delivery_day`` (the latest day with orders by default).
+
+        Price, volume and trade count of cleared days are read from the
+        ``market_summary`` rollup, which changes only with the trades it is
+        refreshed after. Demand and supply change with every order, so they
+        are always summed live. Days not cleared yet are aggregated on the fly.
+        """
+        if delivery_day is None:
+            delivery_day = latest_delivery_day(session)
+            if delivery_day is None:
+                return []
+        cleared = session.execute(
+            select(summary.c.timeslot, summary.c.price, summary.c.volume, summary.c.trades)
+            .where(summary.c.delivery_day == delivery_day)).all()
+        if cleared:
+            slots = defaultdict(empty_slot)
+            for timeslot, price, volume, count in cleared:
+                slots[timeslot].update(price=price, volume=volume, trades=count)
+            add_submitted(session, delivery_day, slots)
+            rows = [{"delivery_day": delivery_day, "timeslot": timeslot, **slots[timeslot]}
+                    for timeslot in sorted(slots)]
+        else:
+            rows = aggregate_day(session, delivery_day)
+
         data = []
-        start_time = datetime.utcnow()
-        for i in range(24):
+        for row in rows:
             data.append({
-                "timestamp": (start_time + timedelta(hours=i)).isoformat(),
-                "pricePerMWh": round(random.randint(4000, 6000), 2),
-                "totalDemandMWh": random.randint(10000, 15000),
-                "totalSupplyMWh": random.randint(9000, 14000)
+                "timestamp": f"{row['delivery_day']}T{row['timeslot']}",
+                "delivery_day": str(row["delivery_day"]),
+                "timeslot": row["timeslot"],
+                "pricePerMWh": row["price"],
+                "totalDemandMWh": row["demand"],
+                "totalSupplyMWh": row["supply"],
+                "clearedVolumeMWh": row["volume"],
+                "trades": row["trades"],
             })
-        return data
\ No newline at end of file
+        return data
@@ -0,0 +1,162 @@
+import logging
+import os
+import time
+from collections import Counter as Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+
+load_dotenv()
+
+# Requests slower than this are logged with the SQL they ran; unset = off.
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0") or 0)
+# Statements kept per request for the slow log.
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "200"))
+
+logger = logging.getLogger("onction.slow_requests")
+
+# With several worker processes point PROMETHEUS_MULTIPROC_DIR at a shared,
+# empty directory so /metrics sums every worker.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to the end of the response, per route.",
+    ["method", "route", "status"])
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements run per request.",
+    ["method", "route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000))
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request.",
+    ["method", "route"])
+DB_QUERIES = Counter("db_queries", "SQL statements run, in or out of a request.")
+MATCHING_SECONDS = Histogram(
+    "matching_engine_duration_seconds", "Matching engine call duration.",
+    ["engine", "outcome"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+WS_CONNECTIONS = Gauge(
+    "websocket_connections", "Open WebSocket connections.", multiprocess_mode="livesum")
+WS_FANOUT_SECONDS = Histogram(
+    "websocket_fanout_seconds", "Time to queue one message for every local subscriber.",
+    ["topic"], buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1))
+WS_SEND_LATENCY_SECONDS = Histogram(
+    "websocket_send_latency_seconds", "From a message being queued for a client to it being sent.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+WS_DROPPED = Counter("websocket_messages_dropped", "Messages not queued because a client's queue was full.")
+
+
+class RequestStats():
+    """SQL run on behalf of one request."""
+
+    def __init__(self, capture: bool):
+        self.queries = 0
+        self.seconds = 0.0
+        self.statements: Optional[List[Tuple[str, float]]] = [] if capture else None
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERIES.inc()
+    stats = current_request.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.seconds += elapsed
+    if stats.statements is not None and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.statements.append((statement, elapsed))
+
+
+def instrument_engine(engine):
+    """Count and time the statements of ``engine`` (a sync or async engine)."""
+    target = getattr(engine, "sync_engine", engine)
+    if not event.contains(target, "before_cursor_execute", before_cursor_execute):
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+        event.listen(target, "after_cursor_execute", after_cursor_execute)
+
+
+class MetricsMiddleware():
+    """Per-route latency, SQL count and SQL time for every HTTP request.
+
+    A plain ASGI middleware, so streamed responses are timed to their last
+    chunk. The route label is the path template (``/Trades/{Buyer_id}``),
+    not the URL, to keep the label set small.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(capture=SLOW_REQUEST_MS > 0)
+        token = current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_SECONDS.labels(method, route, str(status)).observe(elapsed)
+            REQUEST_QUERIES.labels(method, route).observe(stats.queries)
+            REQUEST_DB_SECONDS.labels(method, route).observe(stats.seconds)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                log_slow_request(method, scope["path"], status, elapsed, stats)
+
+
+def log_slow_request(method: str, path: str, status: int, elapsed: float, stats: RequestStats):
+    # Identical statements are grouped: one repeated many times is an N+1.
+    repeated = Tally(statement for statement, _ in stats.statements)
+    spent = Tally()
+    for statement, seconds in stats.statements:
+        spent[statement] += seconds
+    lines = [f"{count:>5}x {spent[statement] * 1000:9.1f} ms  {' '.join(statement.split())[:500]}"
+             for statement, count in repeated.most_common()]
+    logger.warning("slow request %s %s -> %s in %.1f ms, %d queries in %.1f ms\n%s",
+                   method, path, status, elapsed * 1000, stats.queries, stats.seconds * 1000, "\n".join(lines))
+
+
+@contextmanager
+def time_matching(engine: str):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        MATCHING_SECONDS.labels(engine, outcome).observe(time.perf_counter() - start)
+
+
+def topic_label(topic: str) -> str:
+    # "market.2025-01-01" -> "market": one series per kind, not per day or trader.
+    return topic.split(".", 1)[0]
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,307 @@
+import asyncio
+import bisect
+import json
+import threading
+import uuid
+from datetime import date, datetime, timezone
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, func, select
+from sqlmodel import Session
+
+from models import Order
+from modules.broker import MemoryBroker
+from modules.websocket_connection import manager
+
+# Internal topic carrying book changes between workers.
+BOOK_CHANGED = "orderbook.changed"
+
+orders = Order.__table__
+
+PAYLOAD_FIELDS = ("order_ref", "common_name", "trader_id", "order_type", "quantity", "price", "timeslot",
+                  "delivery_day", "fully_matched", "max_dispatch", "quantity_filled")
+
+
+def book_entry(order: Any) -> Dict[str, Any]:
+    """An order as a clearing payload row: the shape ``load_clearing_payload`` sends."""
+    if not isinstance(order, dict):
+        # Rows first: a missing attribute on a Row costs a raised and caught KeyError.
+        order = dict(order._mapping) if hasattr(order, "_mapping") else order.model_dump()
+    entry = {field: order.get(field) for field in PAYLOAD_FIELDS}
+    if isinstance(entry["order_type"], Enum):
+        entry["order_type"] = entry["order_type"].value
+    entry["order_ref"] = str(entry["order_ref"])
+    entry["delivery_day"] = str(entry["delivery_day"])
+    entry["timeslot"] = str(entry["timeslot"])
+    entry["fully_matched"] = bool(entry["fully_matched"])
+    return entry
+
+
+def book_entries(rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """``book_entry`` of many result rows of exactly the ``PAYLOAD_FIELDS``
+    columns, converted a column at a time instead of through a mapping per row."""
+    if not rows:
+        return []
+    columns = dict(zip(PAYLOAD_FIELDS, zip(*rows)))
+    for field in ("order_ref", "delivery_day", "timeslot"):
+        columns[field] = map(str, columns[field])
+    columns["fully_matched"] = map(bool, columns["fully_matched"])
+    return [dict(zip(PAYLOAD_FIELDS, values)) for values in zip(*columns.values())]
+
+
+def first_open_day() -> str:
+    """The earliest delivery day the book keeps: today (UTC). Earlier days
+    can no longer trade, so their unmatched orders stay in the database only."""
+    return str(datetime.now(timezone.utc).date())
+
+
+def fillable(quantity, max_dispatch):
+    """SQL for the part of an order that can trade: ``max_dispatch`` when it
+    caps the quantity, else the whole quantity (``remaining`` in Python)."""
+    return case((and_(max_dispatch > 0, max_dispatch < quantity), max_dispatch), else_=quantity)
+
+
+def remaining(entry: Dict[str, Any]) -> int:
+    fillable = entry["quantity"]
+    if entry["max_dispatch"] and 0 < entry["max_dispatch"] < fillable:
+        fillable = entry["max_dispatch"]
+    return max(0, fillable - (entry["quantity_filled"] or 0))
+
+
+class Side():
+    """Price levels of one side of a book: total open quantity per price."""
+
+    def __init__(self, descending: bool):
+        self.descending = descending
+        self.prices: List[float] = []
+        self.levels: Dict[float, int] = {}
+
+    def add(self, price: float, quantity: int):
+        if quantity <= 0:
+            return
+        if price not in self.levels:
+            bisect.insort(self.prices, price)
+            self.levels[price] = 0
+        self.levels[price] += quantity
+
+    def remove(self, price: float, quantity: int):
+        if quantity <= 0 or price not in self.levels:
+            return
+        self.levels[price] -= quantity
+        if self.levels[price] <= 0:
+            del self.levels[price]
+            del self.prices[bisect.bisect_left(self.prices, price)]
+
+    def depth(self, levels: Optional[int] = None) -> List[Dict[str, Any]]:
+        prices = reversed(self.prices) if self.descending else iter(self.prices)
+        depth = []
+        for price in prices:
+            if levels is not None and len(depth) >= levels:
+                break
+            depth.append({"price": price, "quantity": self.levels[price]})
+        return depth
+
+
+class Book():
+    """Open orders of one (delivery_day, timeslot) auction."""
+
+    def __init__(self):
+        self.bids = Side(descending=True)
+        self.offers = Side(descending=False)
+        self.orders: Dict[str, Dict[str, Any]] = {}
+
+    def side(self, entry) -> Side:
+        return self.bids if entry["order_type"] == "BUY" else self.offers
+
+    def add(self, entry):
+        self.orders[entry["order_ref"]] = entry
+        self.side(entry).add(entry["price"], remaining(entry))
+
+    def remove(self, ref) -> Optional[Dict[str, Any]]:
+        entry = self.orders.pop(ref, None)
+        if entry is not None:
+            self.side(entry).remove(entry["price"], remaining(entry))
+        return entry
+
+
+class OrderBook():
+    """Open orders of every auction, kept in memory.
+
+    Orders are grouped by ``(delivery_day, timeslot)`` with price levels per
+    side, so depth costs O(levels). Writers keep it current: ``order_ingest``
+    and ``order_stream`` after inserting, the dashboard routes after updates
+    and deletes, and ``trade_store`` after recording fills. Fully matched
+    orders leave the book, and so do days before ``first_open_day`` once
+    they have passed. Until ``load`` has run (at app startup) it stays
+    empty and ignores changes.
+
+    Every change is also published on ``orderbook.changed`` so the books of
+    other workers follow along when a shared broker is configured. Without
+    one, or while it is down, each worker's book holds only its own
+    changes, which is why clearing reads the database instead. All changes
+    are idempotent (upsert, remove, set fill state).
+    """
+
+    def __init__(self):
+        self.books: Dict[Tuple[str, str], Book] = {}
+        self.days: Dict[str, set] = {}
+        self.located: Dict[str, Tuple[str, str]] = {}
+        self.loaded = False
+        self.first_day = first_open_day()
+        self.origin = uuid.uuid4().hex
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.lock = threading.RLock()
+
+    def load(self, session: Session):
+        """Rebuild from the database: every order of today or later with
+        quantity left to fill."""
+        first_day = first_open_day()
+        query = select(orders).where(orders.c.delivery_day >= date.fromisoformat(first_day),
+                                     func.coalesce(orders.c.quantity_filled, 0)
+                                     < fillable(orders.c.quantity, orders.c.max_dispatch))
+        with self.lock:
+            self.books.clear()
+            self.days.clear()
+            self.located.clear()
+            self.first_day = first_day
+            result = session.execute(query.execution_options(yield_per=5000))
+            for row in result:
+                self._upsert(book_entry(row))
+            self.loaded = True
+
+    async def start(self, engine):
+        self.loop = asyncio.get_running_loop()
+        manager.listen(BOOK_CHANGED, self.on_change)
+
+        def load():
+            with Session(engine) as session:
+                self.load(session)
+        await asyncio.to_thread(load)
+
+    def upsert(self, rows: Iterable[Any]):
+        if not self.loaded:
+            return
+        entries = [book_entry(row) for row in rows]
+        with self.lock:
+            self._roll_over()
+            for entry in entries:
+                self._upsert(entry)
+        self._publish("upsert", entries)
+
+    def remove(self, refs: Iterable[Any]):
+        if not self.loaded:
+            return
+        refs = [str(ref) for ref in refs]
+        with self.lock:
+            self._roll_over()
+            for ref in refs:
+                self._remove(ref)
+        self._publish("remove", refs)
+
+    def fill(self, changes: Iterable[Dict[str, Any]]):
+        """Apply new fill state (``order_ref``, ``quantity_filled``, ``fully_matched``)."""
+        if not self.loaded:
+            return
+        changes = [{"order_ref": str(change["order_ref"]), "quantity_filled": change["quantity_filled"],
+                    "fully_matched": bool(change["fully_matched"])} for change in changes]
+        with self.lock:
+            self._roll_over()
+            for change in changes:
+                self._fill(change)
+        self._publish("fill", changes)
+
+    def depth(self, delivery_day, timeslot=None, levels: Optional[int] = None) -> List[Dict[str, Any]]:
+        delivery_day = str(delivery_day)
+        with self.lock:
+            timeslots = [str(timeslot)] if timeslot is not None else sorted(self.days.get(delivery_day, ()))
+            depth = []
+            for slot in timeslots:
+                book = self.books.get((delivery_day, slot))
+                if book is None:
+                    continue
+                depth.append({
+                    "delivery_day": delivery_day,
+                    "timeslot": slot,
+                    "bids": book.bids.depth(levels),
+                    "offers": book.offers.depth(levels),
+                })
+            return depth
+
+    def on_change(self, message: str):
+        change = json.loads(message)
+        if change["origin"] == self.origin:
+            return
+        with self.lock:
+            self._roll_over()
+            for item in change["items"]:
+                if change["op"] == "upsert":
+                    self._upsert(item)
+                elif change["op"] == "remove":
+                    self._remove(item)
+                elif change["op"] == "fill":
+                    self._fill(item)
+
+    def _roll_over(self):
+        first_day = first_open_day()
+        if first_day == self.first_day:
+            return
+        self.first_day = first_day
+        for day in [day for day in self.days if day < first_day]:
+            for slot in self.days.pop(day):
+                for ref in self.books.pop((day, slot)).orders:
+                    self.located.pop(ref, None)
+
+    def _upsert(self, entry):
+        self._remove(entry["order_ref"])
+        # Open by quantity, not by the stored flag: an amended order's flag
+        # may predate its new quantity.
+        if not remaining(entry) or entry["delivery_day"] < self.first_day:
+            return
+        key = (entry["delivery_day"], entry["timeslot"])
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = Book()
+            self.days.setdefault(key[0], set()).add(key[1])
+        book.add(entry)
+        self.located[entry["order_ref"]] = key
+
+    def _remove(self, ref):
+        key = self.located.pop(ref, None)
+        if key is None:
+            return None
+        book = self.books[key]
+        entry = book.remove(ref)
+        if not book.orders:
+            del self.books[key]
+            self.days[key[0]].discard(key[1])
+            if not self.days[key[0]]:
+                del self.days[key[0]]
+        return entry
+
+    def _fill(self, change):
+        key = self.located.get(change["order_ref"])
+        if key is None:
+            return
+        entry = dict(self.books[key].orders[change["order_ref"]])
+        entry["quantity_filled"] = change["quantity_filled"]
+        entry["fully_matched"] = change["fully_matched"]
+        self._upsert(entry)
+
+    def _publish(self, op: str, items: list):
+        # Only other workers need it; without a shared broker there are none.
+        if manager.broker is None or isinstance(manager.broker, MemoryBroker) or self.loop is None or not items:
+            return
+        message = {"origin": self.origin, "op": op, "items": items}
+        coroutine = manager.publish_json(BOOK_CHANGED, message)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.loop.create_task(coroutine)
+        else:
+            asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+order_book = OrderBook()
@@ -0,0 +1,68 @@
+import uuid
+from typing import Iterable, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from models import BulkOrderResult, Create, IngestMode, Order, RowError, Status
+from modules.order_book import order_book
+
+BATCH_SIZE = 5000
+
+orders = Order.__table__
+
+
+def prepare_order(row: Union[Create, dict], trader_id: Optional[str] = None) -> dict:
+    """Validate one submitted order and turn it into an ``order`` table row."""
+    if trader_id is not None and isinstance(row, dict):
+        row = {**row, "trader_id": str(trader_id)}
+    order = Create.model_validate(row).model_dump()
+    order["order_type"] = order["order_type"].value
+    if trader_id is not None:
+        order["trader_id"] = str(trader_id)
+    order["order_ref"] = uuid.uuid4()
+    order["status"] = Status.PENDING
+    order["fully_matched"] = False
+    return order
+
+
+def ingest_orders(
+        session: Session,
+        rows: Iterable[Union[Create, dict]],
+        trader_id: Optional[str] = None,
+        mode: IngestMode = IngestMode.ALL_OR_NOTHING) -> Tuple[BulkOrderResult, List[dict]]:
+    """Validate a batch of orders in one pass and insert it in one transaction.
+
+    Rows that fail validation are reported by position. In ``all_or_nothing``
+    mode any rejected row means nothing is inserted; in ``best_effort`` mode
+    the valid rows are still written. The rows as stored are returned
+    along with the result, for announcing them.
+    """
+    prepared, rejected = [], []
+    for position, row in enumerate(rows):
+        try:
+            prepared.append(prepare_order(row, trader_id))
+        except (ValidationError, ValueError, TypeError) as error:
+            rejected.append(RowError(row=position, error=str(error)))
+
+    if rejected and mode == IngestMode.ALL_OR_NOTHING:
+        return BulkOrderResult(inserted=0, rejected=rejected), []
+
+    try:
+        insert_orders(session, prepared)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    order_book.upsert(prepared)
+    return BulkOrderResult(
+        inserted=len(prepared),
+        order_refs=[order["order_ref"] for order in prepared],
+        rejected=rejected), prepared
+
+
+def insert_orders(session: Session, rows: list):
+    """Batched multi-row INSERT of prepared order rows; the caller commits."""
+    for start in range(0, len(rows), BATCH_SIZE):
+        session.execute(insert(orders), rows[start:start + BATCH_SIZE])
@@ -0,0 +1,165 @@
+import codecs
+import csv
+import json
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import RowError, UploadResult
+from modules.order_book import order_book
+from modules.order_ingest import insert_orders, prepare_order
+
+CHUNK_SIZE = 2000
+# Only the first rejects are echoed back; the count covers all of them.
+MAX_REPORTED_REJECTS = 1000
+
+CSV_TYPES = {"text/csv", "application/csv"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}
+
+
+def upload_format(content_type: Optional[str], fmt: Optional[str] = None) -> str:
+    if fmt:
+        return fmt.lower()
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in CSV_TYPES:
+        return "csv"
+    if media_type in NDJSON_TYPES:
+        return "ndjson"
+    raise ValueError(f"Unsupported upload content type {media_type!r}, send text/csv or application/x-ndjson")
+
+
+class UploadError(Exception):
+    """A streamed upload stopped part way. Chunks before the failure stay
+    committed; ``result`` says how many rows were written and up to which
+    row number, so the client can resend the rest."""
+
+    def __init__(self, error: Exception, result: UploadResult):
+        super().__init__(str(error))
+        self.result = result
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decoded lines, each with its line ending, as a text file yields them."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in stream:
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[str]:
+    """Lines grouped into whole records. A quoted CSV field may hold line
+    breaks, so a CSV record ends only once its quotes are balanced (an
+    escaped quote is doubled and keeps the count even)."""
+    record, quotes = "", 0
+    async for line in iter_lines(stream):
+        record += line
+        if fmt == "csv":
+            quotes += line.count('"')
+            if quotes % 2:
+                continue
+        yield record
+        record, quotes = "", 0
+    if record:
+        yield record
+
+
+async def iter_line_batches(stream: AsyncIterator[bytes], size: int, fmt: str) -> AsyncIterator[List[str]]:
+    batch = []
+    async for record in iter_records(stream, fmt):
+        if record.strip():
+            batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_batch(lines: List[str], fmt: str, header: Optional[List[str]]) -> List[Any]:
+    """Parse whole records into row dicts; unparsable lines come back as the exception."""
+    if fmt == "csv":
+        # Empty cells are dropped so model defaults (e.g. timeslot) apply.
+        return [{key: value for key, value in row.items() if value not in ("", None)}
+                for row in csv.DictReader(lines, fieldnames=header)]
+    rows = []
+    for line in lines:
+        try:
+            rows.append(json.loads(line))
+        except ValueError as error:
+            rows.append(error)
+    return rows
+
+
+def write_chunk(session: Session, rows: List[Any], first_row: int, trader_id: Optional[str]):
+    prepared, rejected = [], []
+    for position, row in enumerate(rows, start=first_row):
+        try:
+            if isinstance(row, Exception):
+                raise row
+            prepared.append(prepare_order(row, trader_id))
+        except (ValueError, TypeError) as error:
+            rejected.append(RowError(row=position, error=str(error)))
+    try:
+        insert_orders(session, prepared)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    order_book.upsert(prepared)
+    return len(prepared), rejected
+
+
+async def stream_orders(
+        session: AsyncSession,
+        stream: AsyncIterator[bytes],
+        fmt: str,
+        trader_id: Optional[str] = None,
+        chunk_size: int = CHUNK_SIZE) -> UploadResult:
+    """Parse, validate and insert an uploaded order file chunk by chunk.
+
+    Only one chunk of rows is held in memory at a time and each chunk is
+    committed on its own, so memory stays flat whatever the file size.
+    Rows are numbered from 0, not counting a CSV header line or blank
+    lines. If a chunk fails, ``UploadError`` carries the result up to the
+    last committed chunk.
+    """
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Unsupported upload format {fmt!r}")
+    start = time.perf_counter()
+    header = None
+    total = inserted = rejected_count = 0
+    rejected: List[RowError] = []
+
+    def summary(error: Optional[Exception] = None) -> UploadResult:
+        seconds = time.perf_counter() - start
+        return UploadResult(
+            rows=total,
+            inserted=inserted,
+            rejected_count=rejected_count,
+            rejected=rejected,
+            seconds=round(seconds, 6),
+            rows_per_second=round(total / seconds, 1) if seconds else 0.0,
+            last_row=total - 1 if total else None,
+            error=str(error) if error else None)
+
+    try:
+        async for lines in iter_line_batches(stream, chunk_size, fmt):
+            if fmt == "csv" and header is None:
+                header = next(csv.reader(lines[:1]))
+                lines = lines[1:]
+            rows = parse_batch(lines, fmt, header)
+            written, errors = await session.run_sync(write_chunk, rows, total, trader_id)
+            total += len(rows)
+            inserted += written
+            rejected_count += len(errors)
+            rejected.extend(errors[:max(0, MAX_REPORTED_REJECTS - len(rejected))])
+    except Exception as error:
+        raise UploadError(error, summary(error)) from error
+    return summary()
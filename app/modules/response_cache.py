@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from modules.serialization import FastJSONResponse
+from modules.websocket_connection import manager
+
+# Tags name what a cached response was built from; writers invalidate by tag.
+MARKET = "market"
+TRADES = "trades"
+WINDOW = "window"
+
+# Internal topic telling other workers to drop their in-process entries.
+CACHE_INVALIDATED = "cache.invalidated"
+
+# Response headers worth replaying from a cached entry.
+CACHED_HEADERS = ("x-next-cursor",)
+
+Entry = Tuple[str, bytes, Dict[str, str], float]
+
+
+class MemoryCache():
+    """In-process LRU with a TTL per entry and a tag -> keys index.
+
+    Each entry remembers its tags, so an entry leaving by expiry, eviction
+    or replacement also leaves the index and tag sets never outgrow the
+    entries.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, Entry, Tuple[str, ...]]]" = OrderedDict()
+        self.tags: Dict[str, set] = {}
+        self.lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Entry]:
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            expires, entry, _ = item
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    async def set(self, key: str, entry: Entry, tags: Iterable[str], ttl: float):
+        tags = tuple(tags)
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (time.monotonic() + ttl, entry, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    async def invalidate(self, tags: Iterable[str]):
+        self.drop(tags)
+
+    def drop(self, tags: Iterable[str]):
+        with self.lock:
+            for tag in tags:
+                for key in list(self.tags.get(tag, ())):
+                    self._remove(key)
+
+    def _remove(self, key: str):
+        item = self.entries.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisCache():
+    """Entries shared by every worker in Redis; a set per tag lists its keys."""
+
+    def __init__(self, url: str, prefix: str = "onction:cache:"):
+        # Imported here so the in-process cache does not need the redis package.
+        from redis import asyncio as aioredis
+
+        self.redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Entry]:
+        raw = await self.redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        header, body = raw.split(b"\n", 1)
+        etag, headers, cost = json.loads(header)
+        return etag, body, headers, cost
+
+    async def set(self, key: str, entry: Entry, tags: Iterable[str], ttl: float):
+        etag, body, headers, cost = entry
+        raw = json.dumps([etag, headers, cost]).encode() + b"\n" + body
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, raw, px=int(ttl * 1000))
+            for tag in tags:
+                pipe.sadd(f"{self.prefix}tag:{tag}", self.prefix + key)
+                pipe.pexpire(f"{self.prefix}tag:{tag}", int(ttl * 1000))
+            await pipe.execute()
+
+    async def invalidate(self, tags: Iterable[str]):
+        for tag in tags:
+            tag_key = f"{self.prefix}tag:{tag}"
+            keys = await self.redis.smembers(tag_key)
+            await self.redis.delete(tag_key, *keys)
+
+
+class ResponseCache():
+    """Caches JSON responses of read-heavy routes, answers ``If-None-Match``
+    with 304, and drops entries by tag when the data behind them changes.
+
+    Writers call ``invalidate`` with the tags they touched. In-process
+    entries are dropped on every worker through the WebSocket broker;
+    Redis entries are shared, so dropping them once is enough.
+    """
+
+    def __init__(self, backend, ttl: float = 30.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.origin = uuid.uuid4().hex
+        # Bumped on every invalidation, here or on another worker.
+        self.generation = 0
+        self.hits = self.misses = self.not_modified = self.invalidations = 0
+        self.saved_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    async def serve(self, request: Request, tags: Tuple[str, ...],
+                    produce: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Response:
+        """The cached response for this URL, or ``produce()``'s, cached under ``tags``."""
+        key = f"{request.url.path}?{request.url.query}"
+        entry = await self.backend.get(key)
+        if entry is not None:
+            etag, body, headers, cost = entry
+            self.saved_seconds += cost
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                self.not_modified += 1
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+            self.hits += 1
+            return Response(body, media_type="application/json",
+                            headers={**headers, "ETag": etag, "Cache-Control": "no-cache", "X-Cache": "HIT"})
+
+        generation = self.generation
+        start = time.perf_counter()
+        data = await produce()
+        response = data if isinstance(data, Response) else FastJSONResponse(data)
+        cost = time.perf_counter() - start
+        self.misses += 1
+        self.miss_seconds += cost
+
+        etag = '"' + hashlib.blake2b(response.body, digest_size=16).hexdigest() + '"'
+        headers = {name: value for name, value in response.headers.items() if name in CACHED_HEADERS}
+        # Data read before an invalidation that landed meanwhile may be stale.
+        if generation == self.generation:
+            await self.backend.set(key, (etag, response.body, headers, cost), tags, ttl or self.ttl)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Cache"] = "MISS"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        return response
+
+    async def invalidate(self, *tags: str):
+        self.invalidations += 1
+        self.generation += 1
+        await self.backend.invalidate(tags)
+        if isinstance(self.backend, MemoryCache):
+            await manager.publish_json(CACHE_INVALIDATED, {"origin": self.origin, "tags": tags})
+
+    def on_invalidate(self, message: str):
+        change = json.loads(message)
+        if change["origin"] != self.origin:
+            self.generation += 1
+            self.backend.drop(change["tags"])
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.not_modified + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.not_modified) / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "saved_seconds": round(self.saved_seconds, 6),
+            "miss_seconds": round(self.miss_seconds, 6),
+            "entries": len(self.backend.entries) if isinstance(self.backend, MemoryCache) else None,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def build_cache(url: Optional[str] = None) -> ResponseCache:
+    url = url if url is not None else os.getenv("CACHE_URL", "")
+    ttl = float(os.getenv("CACHE_TTL", "30"))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return ResponseCache(RedisCache(url), ttl=ttl)
+    return ResponseCache(MemoryCache(int(os.getenv("CACHE_MAX_ENTRIES", "1024"))), ttl=ttl)
+
+
+response_cache = build_cache()
+manager.listen(CACHE_INVALIDATED, response_cache.on_invalidate)
@@ -0,0 +1,58 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+try:
+    import orjson
+except ImportError:  # the stdlib path below gives the same output, only slower
+    orjson = None
+
+
+def json_default(value: Any) -> Any:
+    # Only reached for types orjson does not know natively (models, Decimal, ...).
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes for rows of plain values: dates, times, UUIDs and enums included."""
+    if orjson is not None:
+        # UTC as "Z", the way Pydantic writes the same datetimes.
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return json.dumps(jsonable_encoder(content), separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered with orjson and no ``jsonable_encoder`` pass.
+
+    Meant for list routes that hand over dict rows straight from a Core
+    ``select``; returning it also skips FastAPI's per-row ``response_model``
+    validation, so the query has to select the model's columns itself
+    (see ``model_columns``).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_columns(model, table) -> List[Any]:
+    """The columns of ``table`` that ``model`` serializes, in the model's field order."""
+    return [table.c[name] for name in model.model_fields if name in table.c]
+
+
+def select_as(model, table):
+    """``select`` of exactly the columns a response model returns."""
+    return select(*model_columns(model, table))
+
+
+def rows_response(rows: Sequence[Any], headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    """Result rows (``Row``s or dicts) as a JSON array of objects."""
+    if rows and not isinstance(rows[0], dict):
+        # zip with the shared key tuple is several times cheaper than Row._mapping.
+        keys = rows[0]._fields
+        rows = [dict(zip(keys, row)) for row in rows]
+    return FastJSONResponse(rows, headers=headers)
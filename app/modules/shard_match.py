@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from modules.local_match import LocalMatch
+
+
+def shard_payload(payload: List[Dict[str, Any]]) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+    """Split a clearing payload into independent (delivery_day, timeslot) auctions."""
+    shards = defaultdict(list)
+    for order in payload:
+        shards[(str(order["delivery_day"]), str(order["timeslot"]))].append(order)
+    return shards
+
+
+def _match_shard(payload, matching_id):
+    # Runs in a pool worker, so it has to live at module level to be picklable.
+    start = time.perf_counter()
+    trades = LocalMatch().match(payload, matching_id)
+    return trades, time.perf_counter() - start
+
+
+class ShardedMatch():
+    """Clears every (delivery_day, timeslot) shard of a payload concurrently.
+
+    Shards go to a process pool when wrapping ``LocalMatch`` and are sent as
+    parallel requests otherwise, after a single one while the engine's
+    circuit breaker is not closed. Results are merged into a single trade list
+    alongside per-shard timings.
+    """
+
+    workers = int(os.getenv("CLEARING_WORKERS", "0")) or os.cpu_count() or 1
+    concurrency = int(os.getenv("CLEARING_SHARD_CONCURRENCY", "8"))
+
+    _executor: ProcessPoolExecutor | None = None
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    @classmethod
+    def executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            # spawn: forking a process that already runs threadpool threads is unsafe.
+            cls._executor = ProcessPoolExecutor(
+                max_workers=cls.workers,
+                mp_context=multiprocessing.get_context("spawn"))
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls):
+        if cls._executor is not None:
+            cls._executor.shutdown(cancel_futures=True)
+            cls._executor = None
+
+    async def trigger_matching_engine(self, params, payload) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        shards = shard_payload(payload)
+        results = []
+        if isinstance(self.engine, LocalMatch):
+            matching_id = str(uuid.uuid4())
+            loop = asyncio.get_running_loop()
+            tasks = [loop.run_in_executor(self.executor(), _match_shard, shard, matching_id)
+                     for shard in shards.values()]
+        else:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            pending = list(shards.values())
+            breaker = getattr(self.engine, "breaker", None)
+            if pending and breaker is not None and breaker.state != "closed":
+                # A half-open breaker lets one trial call through and refuses
+                # the rest, so fanning out now would fail the whole clearing.
+                # The first shard goes alone (raising at once if the circuit
+                # is open) and the others follow once it has closed it.
+                results.append(await self._remote_shard(semaphore, params, pending.pop(0)))
+            tasks = [self._remote_shard(semaphore, params, shard) for shard in pending]
+
+        results.extend(await asyncio.gather(*tasks))
+
+        trades, timings = [], []
+        for (delivery_day, timeslot), shard, (shard_trades, seconds) in zip(shards, shards.values(), results):
+            trades.extend(shard_trades or [])
+            timings.append({
+                "delivery_day": delivery_day,
+                "timeslot": timeslot,
+                "orders": len(shard),
+                "trades": len(shard_trades or []),
+                "seconds": round(seconds, 6),
+            })
+        return trades, timings
+
+    async def _remote_shard(self, semaphore, params, shard):
+        async with semaphore:
+            start = time.perf_counter()
+            trades = await self.engine.trigger_matching_engine(params, shard)
+            return trades, time.perf_counter() - start
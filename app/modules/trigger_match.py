@@ -1,29 +1,172 @@
-import os 
-import requests
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+import time
+import httpx
 from dotenv import load_dotenv
 
+from modules import wire
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the matching engine while the breaker is open."""
+
+
+class CircuitBreaker():
+    """Stops calling a failing upstream for ``reset_timeout`` seconds after
+    ``failure_threshold`` consecutive failed calls, then lets a single trial
+    call through (half-open) to decide whether to close again. Other calls
+    made while the trial runs are refused as if the circuit were open."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise while the circuit is open or its trial call runs. Returns
+        whether this call is the trial; the caller ends it with ``end_trial``."""
+        state = self.state
+        if state == "open" or (state == "half-open" and self.trial_running):
+            raise CircuitOpenError("matching engine circuit is open, retry later")
+        if state == "half-open":
+            self.trial_running = True
+            return True
+        return False
+
+    def end_trial(self):
+        self.trial_running = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
 class TriggerMatch():
     # url = f"https://onction-matching-engine-762140739532.europe-west2.run.app/v1/match"
-    url = f"http://144.91.85.115:8000/v1/match"
+    url = os.getenv("MATCHING_ENGINE_URL", "http://144.91.85.115:8000/v1/match")
     api_key = os.getenv('API_KEY')
-    
+    timeout = float(os.getenv("MATCHING_ENGINE_TIMEOUT", "60"))
+    connect_timeout = float(os.getenv("MATCHING_ENGINE_CONNECT_TIMEOUT", "5"))
+    retries = int(os.getenv("MATCHING_ENGINE_RETRIES", "3"))
+    backoff = float(os.getenv("MATCHING_ENGINE_BACKOFF", "0.5"))
+    # A match request is not idempotent: a retry after the engine may have
+    # received it could clear the same orders twice. Only retry failures
+    # that happen before the request is sent, and 429, which refuses it
+    # unprocessed; a 5xx or read timeout fails the call.
+    retry_statuses = {429}
+    retry_errors = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+    # "columns" sends the payload as columnar msgpack (modules.wire) and asks
+    # for trades back the same way; an engine answering 415 gets JSON again.
+    wire_format = os.getenv("MATCHING_ENGINE_WIRE", "json").strip().lower()
+    columns_rejected = False
+
+    # Shared by every instance so clearing runs reuse pooled keep-alive connections.
+    _client: httpx.AsyncClient | None = None
+    breaker = CircuitBreaker(
+        failure_threshold=int(os.getenv("MATCHING_ENGINE_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("MATCHING_ENGINE_BREAKER_RESET", "30")),
+    )
+
     def __init__(self):
         pass
 
-    def create_header(self):
+    def create_header(self, columns: bool = False):
         headers = {
             "accept": "application/json",
             "X-API-Key": f"{self.api_key}".strip(),
             "Content-Type": "application/json",
-        } 
+        }
+        if columns:
+            headers["accept"] = f"{wire.COLUMNS_CONTENT_TYPE}, application/json;q=0.5"
+            headers["Content-Type"] = wire.COLUMNS_CONTENT_TYPE
         return headers
-    
-    def trigger_matching_engine(self, params, payload):
-        trade = requests.post(
-            self.url,
-            headers=self.create_header(),
-            params=params, 
-            json = payload)
-        return trade.json() 
+
+    @classmethod
+    def use_columns(cls) -> bool:
+        return cls.wire_format == "columns" and wire.available() and not cls.columns_rejected
+
+    @classmethod
+    def client(cls) -> httpx.AsyncClient:
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                timeout=httpx.Timeout(cls.timeout, connect=cls.connect_timeout),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+            )
+        return cls._client
+
+    @classmethod
+    async def aclose(cls):
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
+    async def trigger_matching_engine(self, params, payload):
+        trial = self.breaker.before_call()
+        try:
+            response = await self._post_with_retry(params, payload)
+        except httpx.HTTPStatusError as error:
+            if error.response.status_code >= 500:
+                self.breaker.record_failure()
+            raise
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        finally:
+            # Ends with the call however it ended (4xx, cancelled), so the
+            # next call can be the trial if this one decided nothing.
+            if trial:
+                self.breaker.end_trial()
+        self.breaker.record_success()
+        if response.headers.get("content-type", "").startswith(wire.COLUMNS_CONTENT_TYPE):
+            return wire.decode_rows(response.content, wire.TRADE_SCHEMA, typed=True)
+        return response.json()
+
+    async def _post_with_retry(self, params, payload) -> httpx.Response:
+        columns = self.use_columns()
+        # Encoded once, not once per attempt.
+        body = {"content": wire.encode_rows(payload, wire.PAYLOAD_SCHEMA)} if columns else {"json": payload}
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client().post(
+                    self.url,
+                    headers=self.create_header(columns),
+                    params=params,
+                    **body)
+                if columns and response.status_code == 415:
+                    logger.warning("Matching engine does not accept %s, falling back to JSON",
+                                   wire.COLUMNS_CONTENT_TYPE)
+                    type(self).columns_rejected = True
+                    return await self._post_with_retry(params, payload)
+                if response.status_code not in self.retry_statuses:
+                    response.raise_for_status()
+                    return response
+                if attempt == self.retries:
+                    response.raise_for_status()
+            except self.retry_errors:
+                if attempt == self.retries:
+                    raise
+            # Exponential backoff with full jitter.
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
@@ -1,21 +1,211 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, Callable, Tuple
 from fastapi import WebSocket
+from modules.metrics import WS_CONNECTIONS, WS_DROPPED, WS_FANOUT_SECONDS, WS_SEND_LATENCY_SECONDS, topic_label
+
+# Topic every connection implicitly follows; ``broadcast`` publishes to it.
+EVERYONE = "*"
+CHAT = "chat"
+ROOM = "room"
+NOTIFICATIONS = "notifications"
+WINDOW = "window"
+
+
+def market_topic(delivery_day) -> str:
+    return f"market.{delivery_day}"
+
+
+def trades_topic(trader_id: str) -> str:
+    return f"trades.{trader_id}"
+
+
+def clearing_topic(delivery_day) -> str:
+    return f"clearing.{delivery_day}"
+
+
+class Client():
+    """One connected socket, the queue its sender task drains and its topics."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        # (message, time it was queued), for the send latency metric.
+        self.queue: asyncio.Queue[Tuple[str, float]] = asyncio.Queue(maxsize=queue_size)
+        self.sender: asyncio.Task | None = None
+        self.topics: set[str] = set()
+        self.dropped = 0
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    """Fans messages out to connected sockets without letting one slow
+    client hold up the rest.
+
+    Every client gets a bounded outgoing queue drained by its own task, so a
+    broadcast only enqueues the already-serialized text and returns. When a
+    client's queue is full it is either disconnected (``overflow="disconnect"``,
+    the default) or the message is dropped for that client (``"drop"``).
+
+    Clients subscribe to topics such as ``chat`` or ``market.2025-01-01``;
+    ``publish`` walks only that topic's subscribers, while ``broadcast``
+    still reaches every connection.
+
+    Once ``start`` has been given a broker, publishes go through it and come
+    back via ``deliver``, so with a shared broker (see ``modules.broker``)
+    they reach clients connected to every worker. Without one, delivery is
+    local.
+    """
+
+    def __init__(self, queue_size: int = 256, overflow: str = "disconnect"):
+        self.active_connections: dict[WebSocket, Client] = {}
+        self.topics: dict[str, set[Client]] = {}
+        self.listeners: dict[str, list[Callable[[str], None]]] = {}
+        self.broker = None
+        self.queue_size = queue_size
+        self.overflow = overflow
+
+    async def start(self, broker):
+        await broker.start(self.deliver)
+        self.broker = broker
 
-    async def connect(self, websocket: WebSocket):
+    async def close(self):
+        if self.broker is not None:
+            broker, self.broker = self.broker, None
+            await broker.close()
+
+    async def connect(self, websocket: WebSocket, *topics: str):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.register(websocket, *topics)
+
+    def register(self, websocket: WebSocket, *topics: str) -> Client:
+        client = Client(websocket, self.queue_size)
+        client.sender = asyncio.create_task(self._drain(client))
+        self.active_connections[websocket] = client
+        WS_CONNECTIONS.inc()
+        self.subscribe(websocket, *topics)
+        return client
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+        WS_CONNECTIONS.dec()
+        self._forget(client, client.topics)
+        client.topics.clear()
+        if client.sender is not None and client.sender is not asyncio.current_task():
+            client.sender.cancel()
+
+    def subscribe(self, websocket: WebSocket, *topics: str):
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        for topic in topics:
+            self.topics.setdefault(topic, set()).add(client)
+            client.topics.add(topic)
+
+    def unsubscribe(self, websocket: WebSocket, *topics: str):
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        self._forget(client, topics)
+        client.topics.difference_update(topics)
+
+    def listen(self, topic: str, callback: Callable[[str], None]):
+        """Have ``callback`` called in-process with every message on ``topic``.
+
+        A topic with listeners is internal: its messages go to the callbacks
+        only and never to sockets, even ones subscribed to it.
+        """
+        self.listeners.setdefault(topic, []).append(callback)
+
+    def subscribers(self, topic: str) -> int:
+        return len(self.topics.get(topic, ()))
+
+    def _forget(self, client: Client, topics):
+        for topic in topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(client)
+            if not subscribers:
+                del self.topics[topic]
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        client = self.active_connections.get(websocket)
+        if client is None:
+            await websocket.send_text(message)
+        else:
+            self._enqueue(client, message)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        await self.publish(EVERYONE, message)
+
+    async def broadcast_json(self, data: Any):
+        await self.broadcast(json.dumps(data, default=str))
+
+    async def publish(self, topic: str, message: str):
+        if self.broker is None:
+            self.deliver(topic, message)
+        else:
+            await self.broker.publish(topic, message)
+
+    async def publish_json(self, topic: str, data: Any):
+        # Nobody listening (anywhere, for a local hub): skip the serialization too.
+        if self.broker is None and topic not in self.topics and topic not in self.listeners:
+            return
+        await self.publish(topic, json.dumps(data, default=str))
+
+    def deliver(self, topic: str, message: str):
+        """Fan a message out to this worker's subscribers of ``topic``."""
+        callbacks = self.listeners.get(topic)
+        if callbacks is not None:
+            for callback in callbacks:
+                callback(message)
+            return
+        start = time.perf_counter()
+        if topic == EVERYONE:
+            clients = list(self.active_connections.values())
+        else:
+            clients = list(self.topics.get(topic, ()))
+        queued_at = time.perf_counter()
+        for client in clients:
+            self._enqueue(client, message, queued_at)
+        WS_FANOUT_SECONDS.labels(topic_label(topic)).observe(time.perf_counter() - start)
+
+    def _enqueue(self, client: Client, message: str, queued_at: float | None = None):
+        try:
+            client.queue.put_nowait((message, queued_at or time.perf_counter()))
+        except asyncio.QueueFull:
+            client.dropped += 1
+            WS_DROPPED.inc()
+            if self.overflow == "disconnect":
+                self.disconnect(client.websocket)
+                asyncio.create_task(self._close(client.websocket))
+
+    async def _drain(self, client: Client):
+        try:
+            while True:
+                message, queued_at = await client.queue.get()
+                # No per-send timeout: a stalled socket shows up as a full queue.
+                await client.websocket.send_text(message)
+                WS_SEND_LATENCY_SECONDS.observe(time.perf_counter() - queued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Closed socket: forget the client; its receive loop sees the disconnect.
+            self.disconnect(client.websocket)
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            # 1013: try again later — the client could not keep up.
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
 
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(
+    queue_size=int(os.getenv("WS_QUEUE_SIZE", "256")),
+    overflow=os.getenv("WS_OVERFLOW", "disconnect"),
+)
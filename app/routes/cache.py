@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from modules.response_cache import response_cache
+
+router = APIRouter(prefix="/cache", tags=["cache"])
+
+
+@router.get("/metrics")
+def cache_metrics():
+    """Hit ratio of the response cache and the query time it saved on this worker."""
+    return response_cache.metrics()
@@ -1,80 +1,149 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Request
-from typing import List, Annotated, Any, Union
-from models import  Create, Order, Message, Update, ShowOrder, Trades
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Annotated, Any, Union, Dict, Literal, Optional
+from models import  Create, Order, Message, Update, ShowOrder, Trades, BulkOrderResult, IngestMode, UploadResult
 from sqlmodel import Session
-from db.db import get_db
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db.db import get_db, get_async_db
 import uuid
 from utils.utils import authenticate_and_get_user
+from modules.order_ingest import ingest_orders
+from modules.order_stream import UploadError, stream_orders, upload_format
+from modules.events import publish_count, publish_created, publish_orders
+from modules.order_book import order_book
+from modules.response_cache import MARKET, TRADES, response_cache
+from modules.trade_store import amended_fill_state
+from modules.serialization import rows_response, select_as
 
 SessionInit = Annotated[Session,  Depends(get_db)]
+AsyncSessionInit = Annotated[AsyncSession, Depends(get_async_db)]
+
+orders = Order.__table__
+trades = Trades.__table__
+# The columns each response returns, selected as plain rows.
+SHOW_ORDERS = select_as(ShowOrder, orders)
+TRADE_ROWS = select_as(Trades, trades)
+
 router = APIRouter(prefix="/Disco-Dashboard",tags=["Disco Dashboard"])
 
 
 @router.get("/get_bid", response_model=List[ShowOrder])
-def all_bid(
+async def all_bid(
      *, 
-     session: SessionInit, 
+     session: AsyncSessionInit, 
      request: Request) ->  Any:
     
-    user_details = authenticate_and_get_user(request)
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
     user_id = user_details.get("user_id")
     if user_details:
         try:
-            bid = session.query(Order).filter(Order.trader_id == user_id).all()
-            return bid
+            bid = (await session.exec(SHOW_ORDERS.where(orders.c.trader_id == user_id))).all()
+            return rows_response(bid)
         except Exception as error:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
 
 
 @router.get("/Trades/{Buyer_id}")
-def get_trades(*, session: SessionInit, buyer_id: str ) -> Any:
+async def get_trades(*, session: AsyncSessionInit, request: Request, buyer_id: str ) -> Any:
     try:
-        trade = session.query(Trades).filter(Trades.buyer_id == buyer_id).all()
-        if not trade:
-              raise HTTPException(status_code=404, detail="trade not found or has been deleted")
-        return trade
+        async def produce():
+            trade = (await session.exec(TRADE_ROWS.where(trades.c.buyer_id == buyer_id))).all()
+            if not trade:
+                  raise HTTPException(status_code=404, detail="trade not found or has been deleted")
+            return rows_response(trade)
+        return await response_cache.serve(request, (TRADES,), produce)
     except Exception as error:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
     
 
 
 @router.post("/create_bid", response_model=Union[ShowOrder,Message], status_code=status.HTTP_201_CREATED)
-def create_bid(
+async def create_bid(
             *, 
-            session: SessionInit,
+            session: AsyncSessionInit,
             bid_in: List[Create],
             request: Request) -> Any:
-    create_bid = []
     try:
-        user_details = authenticate_and_get_user(request)
+        user_details = await run_in_threadpool(authenticate_and_get_user, request)
         user_id = user_details.get("user_id")
 
-        for bid in bid_in:
-            order_data = bid.dict()
-            order_data["trader_id"] = str(user_id)
-            order_data = Order.model_validate(order_data)
-            session.add(order_data)
-            session.commit()
-            session.refresh(order_data)
-        create_bid.append(order_data)
+        result, created = await session.run_sync(ingest_orders, bid_in, trader_id=user_id)
+        await response_cache.invalidate(MARKET)
+        await publish_created(user_id, created)
         return Message(
             message="bid submitted successfully")
     except Exception as error:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
 
 
+@router.post("/create_bid/bulk", response_model=BulkOrderResult, status_code=status.HTTP_201_CREATED)
+async def create_bid_bulk(
+            *,
+            session: AsyncSessionInit,
+            bid_in: List[Dict[str, Any]],
+            request: Request,
+            mode: IngestMode = IngestMode.ALL_OR_NOTHING) -> Any:
+    """Submit many bids in one transaction.
+
+    Returns the generated ``order_ref``s and any rejected rows. In
+    ``all_or_nothing`` mode a single bad row rejects the whole upload.
+    """
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
+    user_id = user_details.get("user_id")
+    try:
+        result, created = await session.run_sync(ingest_orders, bid_in, trader_id=user_id, mode=mode)
+    except Exception as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
+    if result.rejected and not result.inserted:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=result.model_dump(mode="json"))
+    await response_cache.invalidate(MARKET)
+    await publish_created(user_id, created)
+    return result
+
+
+@router.post("/upload_bids", response_model=UploadResult, status_code=status.HTTP_201_CREATED)
+async def upload_bids(
+            *,
+            session: AsyncSessionInit,
+            request: Request,
+            fmt: Optional[Literal["csv", "ndjson"]] = Query(None, alias="format")) -> Any:
+    """Stream a CSV or NDJSON file of bids into the order book.
+
+    The format comes from ``?format=`` or the Content-Type header. Rows are
+    validated and written in fixed-size chunks as they arrive; the response
+    reports throughput and the rejected rows. If a chunk fails, the 400
+    detail is that report up to the last committed row (``last_row``), so
+    the rest of the file can be resent.
+    """
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
+    user_id = user_details.get("user_id")
+    try:
+        upload = upload_format(request.headers.get("content-type"), fmt)
+        result = await stream_orders(session, request.stream(), upload, trader_id=user_id)
+    except UploadError as error:
+        result = error.result
+    except Exception as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
+    if result.inserted:
+        await response_cache.invalidate(MARKET)
+        await publish_count(user_id, "created", result.inserted)
+    if result.error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=result.model_dump(mode="json"))
+    return result
+
+
 @router.put("/update_bid/{id}", response_model=Union[ShowOrder,Message], status_code=status.HTTP_200_OK)
-def update_bid(*,
+async def update_bid(*,
                  id: uuid.UUID, 
                  bid_in: Update,
-                 session: SessionInit,
+                 session: AsyncSessionInit,
                  request: Request) -> Any:
     """Update a Bid."""
-    user_details = authenticate_and_get_user(request)
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
     user_id = user_details.get("user_id")
     if user_details:
         try:
-            bid = session.get(Order, id)
+            bid = await session.get(Order, id)
             if not bid:
                 raise HTTPException(status_code=404, detail="Order not found")
             if bid.trader_id != user_id:
@@ -82,9 +151,15 @@ def update_bid(*,
             else:
                 update_bid = bid_in.model_dump(exclude_unset=True)
                 bid.sqlmodel_update(update_bid)
+                bid.revision = Order.revision + 1
+                for field, value in amended_fill_state(update_bid).items():
+                    setattr(bid, field, value)
                 session.add(bid)
-                session.commit()
-                session.refresh(bid)
+                await session.commit()
+                await session.refresh(bid)
+                order_book.upsert([bid])
+                await response_cache.invalidate(MARKET)
+                await publish_orders(user_id, "updated", [bid])
                 return Message(
                         message="Bid updated successfully")
         
@@ -93,20 +168,23 @@ def update_bid(*,
 
 
 @router.delete("/delete_bid/{id}", response_model=Message, status_code=status.HTTP_200_OK)
-def delete_bid(
+async def delete_bid(
             *,
             id: uuid.UUID,
-            session: SessionInit,
+            session: AsyncSessionInit,
             request: Request) -> Any:
     """
     Delete an Order.
     """
-    user_details = authenticate_and_get_user(request)
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
     if user_details:
-        bid = session.get(Order, id)
+        bid = await session.get(Order, id)
         if not bid:
             raise HTTPException(status_code=404, detail="Bid not found")
-        session.delete(bid)
-        session.commit()
+        await session.delete(bid)
+        await session.commit()
+        order_book.remove([id])
+        await response_cache.invalidate(MARKET)
+        await publish_orders(bid.trader_id, "deleted", [{"order_ref": id}])
         return Message(
                 message="Bid deleted successfully")
\ No newline at end of file
@@ -1,81 +1,150 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Request
-from typing import List, Annotated, Any, Union
-from models import Create, Message, Update, ShowOrder, Order, Trades
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Annotated, Any, Union, Dict, Literal, Optional
+from models import Create, Message, Update, ShowOrder, Order, Trades, BulkOrderResult, IngestMode, UploadResult
 from sqlmodel import Session
-from db.db import get_db
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db.db import get_db, get_async_db
 import uuid
 from utils.utils import authenticate_and_get_user
+from modules.order_ingest import ingest_orders
+from modules.order_stream import UploadError, stream_orders, upload_format
+from modules.events import publish_count, publish_created, publish_orders
+from modules.order_book import order_book
+from modules.response_cache import MARKET, TRADES, response_cache
+from modules.trade_store import amended_fill_state
+from modules.serialization import rows_response, select_as
 
 SessionInit = Annotated[Session, Depends(get_db)]
+AsyncSessionInit = Annotated[AsyncSession, Depends(get_async_db)]
+
+orders = Order.__table__
+trades = Trades.__table__
+# The columns each response returns, selected as plain rows.
+SHOW_ORDERS = select_as(ShowOrder, orders)
+TRADE_ROWS = select_as(Trades, trades)
+
 router = APIRouter(prefix="/Genco-Dashboard", tags=["Genco Dashboard"])
 
 
 @router.get("/get_offer", response_model=List[ShowOrder])
-def all_offer(
+async def all_offer(
     *,
-    session: SessionInit,
+    session: AsyncSessionInit,
     request: Request) -> Any:
 
-    user_details = authenticate_and_get_user(request)
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
     user_id = user_details.get("user_id")
     if user_details:
         try:
-            offer = session.query(Order).filter(Order.trader_id == user_id).all()
-            return offer
+            offer = (await session.exec(SHOW_ORDERS.where(orders.c.trader_id == user_id))).all()
+            return rows_response(offer)
         except Exception as error:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
 
 
 
 @router.get("/Trades/{Seller_id}")
-def get_trades(*, session: SessionInit, seller_id: str) -> Any:
+async def get_trades(*, session: AsyncSessionInit, request: Request, seller_id: str) -> Any:
     try:
-        trade = session.query(Trades).filter(Trades.seller_id == seller_id).all()
-        if not trade:
-              raise HTTPException(status_code=404, detail="trade not found or has been deleted")
-        return trade
+        async def produce():
+            trade = (await session.exec(TRADE_ROWS.where(trades.c.seller_id == seller_id))).all()
+            if not trade:
+                  raise HTTPException(status_code=404, detail="trade not found or has been deleted")
+            return rows_response(trade)
+        return await response_cache.serve(request, (TRADES,), produce)
     except Exception as error:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
     
 
 @router.post("/create_offer", response_model=Union[Message,ShowOrder], status_code=status.HTTP_201_CREATED)
-def create_offer(
+async def create_offer(
                 *,
-                session: SessionInit,
+                session: AsyncSessionInit,
                 offer_in: List[Create],
                 request: Request) -> Any:
     
-    create_offer = []
     try:
-        user_details = authenticate_and_get_user(request)
+        user_details = await run_in_threadpool(authenticate_and_get_user, request)
         user_id = user_details.get("user_id")
 
-        for offer in offer_in:
-            order_data = offer.dict()
-            order_data["trader_id"] = str(user_id)
-            order_data = Order.model_validate(order_data)
-            session.add(order_data)
-            session.commit()
-            session.refresh(order_data)
-        create_offer.append(order_data)
+        result, created = await session.run_sync(ingest_orders, offer_in, trader_id=user_id)
+        await response_cache.invalidate(MARKET)
+        await publish_created(user_id, created)
         return  Message(message="Offer submitted successfully")
     except Exception as error:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
+
+
+@router.post("/create_offer/bulk", response_model=BulkOrderResult, status_code=status.HTTP_201_CREATED)
+async def create_offer_bulk(
+            *,
+            session: AsyncSessionInit,
+            offer_in: List[Dict[str, Any]],
+            request: Request,
+            mode: IngestMode = IngestMode.ALL_OR_NOTHING) -> Any:
+    """Submit many offers in one transaction.
+
+    Returns the generated ``order_ref``s and any rejected rows. In
+    ``all_or_nothing`` mode a single bad row rejects the whole upload.
+    """
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
+    user_id = user_details.get("user_id")
+    try:
+        result, created = await session.run_sync(ingest_orders, offer_in, trader_id=user_id, mode=mode)
+    except Exception as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
+    if result.rejected and not result.inserted:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=result.model_dump(mode="json"))
+    await response_cache.invalidate(MARKET)
+    await publish_created(user_id, created)
+    return result
     
 
+@router.post("/upload_offers", response_model=UploadResult, status_code=status.HTTP_201_CREATED)
+async def upload_offers(
+            *,
+            session: AsyncSessionInit,
+            request: Request,
+            fmt: Optional[Literal["csv", "ndjson"]] = Query(None, alias="format")) -> Any:
+    """Stream a CSV or NDJSON file of offers into the order book.
+
+    The format comes from ``?format=`` or the Content-Type header. Rows are
+    validated and written in fixed-size chunks as they arrive; the response
+    reports throughput and the rejected rows. If a chunk fails, the 400
+    detail is that report up to the last committed row (``last_row``), so
+    the rest of the file can be resent.
+    """
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
+    user_id = user_details.get("user_id")
+    try:
+        upload = upload_format(request.headers.get("content-type"), fmt)
+        result = await stream_orders(session, request.stream(), upload, trader_id=user_id)
+    except UploadError as error:
+        result = error.result
+    except Exception as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
+    if result.inserted:
+        await response_cache.invalidate(MARKET)
+        await publish_count(user_id, "created", result.inserted)
+    if result.error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=result.model_dump(mode="json"))
+    return result
+
+
 @router.put("/update_offer/{id}", response_model=Union[ShowOrder,Message], status_code=status.HTTP_200_OK)
-def update_offer(*,
+async def update_offer(*,
                  id: uuid.UUID, 
                  offer_in: Update,
-                 session: SessionInit,
+                 session: AsyncSessionInit,
                  request: Request
                  ) -> Any:
     """Update an Offer."""
-    user_details = authenticate_and_get_user(request)
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
     user_id = user_details.get("user_id")
     if user_details:
         try:
-            offer = session.get(Order, id)
+            offer = await session.get(Order, id)
             if not offer:
                 raise HTTPException(status_code=404, detail="Offer not found")
             
@@ -84,28 +153,37 @@ def update_offer(*,
             else: 
                 update_offer = offer_in.model_dump(exclude_unset=True)
                 offer.sqlmodel_update(update_offer)
+                offer.revision = Order.revision + 1
+                for field, value in amended_fill_state(update_offer).items():
+                    setattr(offer, field, value)
                 session.add(offer)
-                session.commit()
-                session.refresh(offer)
+                await session.commit()
+                await session.refresh(offer)
+                order_book.upsert([offer])
+                await response_cache.invalidate(MARKET)
+                await publish_orders(user_id, "updated", [offer])
                 return Message(message="Offer updated successfully")
         except Exception as error:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
 
 
 @router.delete("/delete_offer/{id}", response_model=Message, status_code=status.HTTP_200_OK)
-def delete_offer(
+async def delete_offer(
             *, 
             id: uuid.UUID,
-            session: SessionInit,
+            session: AsyncSessionInit,
             request: Request
             ) -> Any:
     """Delete an Offer."""
 
-    user_details = authenticate_and_get_user(request)
+    user_details = await run_in_threadpool(authenticate_and_get_user, request)
     if user_details:
-        offer = session.get(Order, id)
+        offer = await session.get(Order, id)
         if not offer:
             raise HTTPException(status_code=404, detail="offer not found")
-        session.delete(offer)
-        session.commit()
+        await session.delete(offer)
+        await session.commit()
+        order_book.remove([id])
+        await response_cache.invalidate(MARKET)
+        await publish_orders(offer.trader_id, "deleted", [{"order_ref": id}])
         return Message(message="offer deleted successfully")
\ No newline at end of file
@@ -1,8 +1,31 @@
-from fastapi import APIRouter
+from datetime import date
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db.db import get_async_db
 from modules.market_data  import Marketdata
+from modules.order_book import order_book
+from modules.response_cache import MARKET, response_cache
 
+AsyncSessionInit = Annotated[AsyncSession, Depends(get_async_db)]
 router = APIRouter(prefix="/market-data",tags=["market data"])
 
 @router.get("/")
-def get_market_data():
-    return Marketdata().generate_market_data([])
\ No newline at end of file
+async def get_market_data(session: AsyncSessionInit, request: Request, delivery_day: Optional[date] = None):
+    """Clearing price, demand and supply per timeslot of ``delivery_day``
+    (the latest day with orders when omitted)."""
+    try:
+        return await response_cache.serve(
+            request, (MARKET,), lambda: session.run_sync(Marketdata().generate_market_data, delivery_day))
+    except Exception as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
+
+
+@router.get("/depth/{delivery_day}")
+def get_depth(delivery_day: date,
+              timeslot: Optional[str] = None,
+              levels: Optional[int] = Query(None, ge=1)):
+    """Open quantity per price level, best price first, for each timeslot."""
+    if not order_book.loaded:
+        raise HTTPException(status_code=503, detail="Order book is still loading")
+    return order_book.depth(delivery_day, timeslot, levels)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from modules.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics of this worker (of every worker in multiprocess mode)."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
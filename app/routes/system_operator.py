@@ -1,66 +1,99 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from typing import  Annotated, Any, Union, List
-from models import Order, Trades, Message, Status, Create, ShowOrder
-from sqlmodel import Session,  select
-from db.db import get_db
-from datetime import date
-from modules.trigger_match import TriggerMatch
+import uuid
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request, Response
+from anyio import from_thread
+from typing import  Annotated, Any, Union, List, Dict, Optional
+from models import Trades, Message, Status, Create, ShowOrder, BulkOrderResult, IngestMode
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db.db import get_db, get_async_db
+from datetime import date, time
+from modules.clearing import clearing_jobs, error_status, progress
+from modules.market_data import refresh_market_summary
+from modules.order_ingest import ingest_orders
+from modules.response_cache import MARKET, TRADES, response_cache
+from modules.serialization import rows_response
+from modules.listing import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, fetch_page, ndjson_response,
+                             order_query, trade_query, orders as orders_table, trades as trades_table)
 
 SessionInit = Annotated[Session,  Depends(get_db)]
+AsyncSessionInit = Annotated[AsyncSession, Depends(get_async_db)]
 router = APIRouter(prefix="/tradeclearing",tags=["Trade Clearing"])
 
 
-@router.post("/trigger_matching_engine")
-def trigger_matching_engine(session: SessionInit, date: date) ->  Any:
+@router.post("/trigger_matching_engine", status_code=status.HTTP_202_ACCEPTED)
+async def trigger_matching_engine(response: Response, date: date, sharded: bool = False, wait: bool = False) ->  Any:
+    """Clear all orders for ``date`` in the background.
+
+    Returns the queued job at once; follow it on ``GET /tradeclearing/jobs/{id}``
+    or the ``clearing.{date}`` WebSocket topic. Only one clearing per day
+    runs at a time: while one is queued or running this answers 409 with
+    that job. With ``wait=true`` the request waits and returns the trades as
+    before; with ``sharded=true`` every timeslot is cleared concurrently and
+    the result also carries a per-shard timing breakdown.
+    """
+    job, created = await clearing_jobs.submit(date, sharded)
+    if not created:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail={"message": f"A clearing for {date} is already {job.status}", "job": job_view(job)})
+    if not wait:
+        response.headers["Location"] = f"{router.prefix}/jobs/{job.id}"
+        return job_view(job)
+
     try:
-        params = {"clearing_date": str(date)}
-        query = select(Order).where(Order.delivery_day == date)
-        orders = session.exec(query).all()
-        if orders is None:
-            raise HTTPException(status_code=404, detail=str(error))
-        
-        create_trades = []
-        payload = [{
-                    **order.dict(exclude={"status"}), 
-                    "order_ref": str(order.order_ref), 
-                    "delivery_day": str(order.delivery_day), 
-                    "timeslot": str(order.timeslot),
-                    }for order in orders]
-        data = TriggerMatch().trigger_matching_engine(params, payload)
-        print(f'Payload: {data}')
-
-        if data is None or data == []:
-            raise HTTPException(status_code=404, detail=str(data))
-        else:
-            for new_trade in data:
-                new_trade = Trades.model_validate(new_trade)
-                create_trades.append(new_trade)
-
-                # Update status of the orders in the database
-                buyer_ref = session.exec(select(Order).where(Order.order_ref == new_trade.buyer_order_ref)).all()
-                seller_ref = session.exec(select(Order).where(Order.order_ref == new_trade.seller_order_ref)).all()
-                
-                matched_trade = [*buyer_ref, *seller_ref]
-                for  order_status in matched_trade:
-                    order_status.status = Status.MATCHED
-                    order_status.fully_matched = True
-                    session.add(order_status)
-
-            session.add_all(create_trades)
-            session.commit()
-            for t in create_trades:
-                session.refresh(t)
-        return create_trades
+        trades, shards = await clearing_jobs.wait(job.id)
     except Exception as error:
-         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
-  
-    
+        detail = error.detail if isinstance(error, HTTPException) else str(error)
+        raise HTTPException(status_code=error_status(error), detail=detail)
+    response.status_code = status.HTTP_200_OK
+    if sharded:
+        return {"trades": trades, "shards": shards, "seconds": job.timings["total"], "job_id": job.id}
+    return trades
+
+
+@router.get("/jobs")
+async def clearing_job_list(session: AsyncSessionInit, delivery_day: Optional[date] = None,
+                            limit: int = Query(20, ge=1, le=200)) -> Any:
+    """Most recent clearing jobs first."""
+    return [job_view(job) for job in await clearing_jobs.recent(session, delivery_day, limit)]
+
+
+@router.get("/jobs/{job_id}")
+async def clearing_job(session: AsyncSessionInit, job_id: uuid.UUID) -> Any:
+    """Status, current stage, per-stage timings and outcome of a clearing job."""
+    job = await clearing_jobs.get(session, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Clearing job not found")
+    return job_view(job)
+
+
+def job_view(job) -> Dict[str, Any]:
+    return {**job.model_dump(mode="json"), "progress": progress(job)}
+
 
 @router.get("/get_all_trades")
-def get_trades(*, session: SessionInit) -> Any:
+async def get_trades(*, session: AsyncSessionInit,
+               request: Request,
+               cursor: Optional[str] = None,
+               limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+               delivery_day: Optional[date] = None,
+               timeslot: Optional[time] = None,
+               trader_id: Optional[str] = None,
+               stream: bool = False) -> Any:
+    """Trades oldest first, one page at a time.
+
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` to get the
+    next page; it is absent on the last page. ``stream=true`` returns every
+    matching trade as NDJSON instead.
+    """
     try:
-        trade = session.query(Trades).all()
-        return trade
+        query = trade_query(cursor, delivery_day=delivery_day, timeslot=timeslot, trader_id=trader_id)
+        if stream:
+            return ndjson_response(query)
+
+        async def produce():
+            trade, next_cursor = await session.run_sync(fetch_page, query, trades_table, limit)
+            return rows_response(trade, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+        return await response_cache.serve(request, (TRADES,), produce)
     except Exception as error:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
     
@@ -86,8 +119,11 @@ def delete_trade(*, session: SessionInit, id: int) -> Any:
         trade = session.query(Trades).filter(Trades.id == id).first()
         if not trade:
               raise HTTPException(status_code=404, detail="trade not found")
+        delivery_day = trade.delivery_day
         session.delete(trade)
         session.commit()
+        refresh_market_summary(session, {delivery_day})
+        from_thread.run(response_cache.invalidate, TRADES, MARKET)
         return Message(
             message="Trade deleted successfully"
             )
@@ -97,26 +133,53 @@ def delete_trade(*, session: SessionInit, id: int) -> Any:
 
 
 @router.get("/bid_offers/")
-def all_bid(*, session: SessionInit) ->  Any:
+async def all_bid(*, session: AsyncSessionInit,
+            cursor: Optional[str] = None,
+            limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+            delivery_day: Optional[date] = None,
+            timeslot: Optional[str] = None,
+            status_: Optional[Status] = Query(None, alias="status"),
+            trader_id: Optional[str] = None,
+            stream: bool = False) ->  Any:
+    """Orders one page at a time, paged like ``/get_all_trades``."""
     try:
-        bid = session.query(Order).all()
-        return bid
+        query = order_query(cursor, delivery_day=delivery_day, timeslot=timeslot, status=status_, trader_id=trader_id)
+        if stream:
+            return ndjson_response(query)
+        bid, next_cursor = await session.run_sync(fetch_page, query, orders_table, limit)
+        return rows_response(bid, {"X-Next-Cursor": next_cursor} if next_cursor else None)
     except Exception as error:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
     
 
 
 @router.post("/submit_offer", response_model=Union[Message,ShowOrder], status_code=status.HTTP_201_CREATED)
-def create_offer(*, session: SessionInit, offer_in: List[Create]) -> Any:
-    create_offer = []
+async def create_offer(*, session: AsyncSessionInit, offer_in: List[Create]) -> Any:
     try:
-        for offer in offer_in:
-            offer = Order.model_validate(offer)
-            session.add(offer)
-            session.commit()
-            session.refresh(offer)
-        create_offer.append(offer)
+        await session.run_sync(ingest_orders, offer_in)
+        await response_cache.invalidate(MARKET)
         return Message(
             message="Offer submitted successfully")
     except Exception as error:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
\ No newline at end of file
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
+
+
+@router.post("/submit_offer/bulk", response_model=BulkOrderResult, status_code=status.HTTP_201_CREATED)
+async def submit_offer_bulk(
+            *,
+            session: AsyncSessionInit,
+            offer_in: List[Dict[str, Any]],
+            mode: IngestMode = IngestMode.ALL_OR_NOTHING) -> Any:
+    """Submit many offers in one transaction.
+
+    Returns the generated ``order_ref``s and any rejected rows. In
+    ``all_or_nothing`` mode a single bad row rejects the whole upload.
+    """
+    try:
+        result, _ = await session.run_sync(ingest_orders, offer_in, mode=mode)
+    except Exception as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail= str(error))
+    if result.rejected and not result.inserted:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=result.model_dump(mode="json"))
+    await response_cache.invalidate(MARKET)
+    return result
\ No newline at end of file
@@ -1,17 +1,22 @@
-from fastapi import WebSocket, WebSocketDisconnect, APIRouter, Depends, HTTPException, status
+from fastapi import WebSocket, WebSocketDisconnect, APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import HTMLResponse
 import json
 from datetime import datetime, timezone, timedelta
-from modules.websocket_connection import manager
+from modules.websocket_connection import CHAT, NOTIFICATIONS, ROOM, WINDOW, manager
+from utils.utils import authenticate_and_get_user
+from starlette.concurrency import run_in_threadpool
 from models import SubmissionWindow
 from typing import Annotated
-from sqlmodel import Session
-from db.db import get_db
-import asyncio
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from db.db import get_db, get_async_db
+from modules.countdown import countdown
+from modules.response_cache import WINDOW as WINDOW_TAG, response_cache
 from pydantic import BaseModel, field_validator
 
 router = APIRouter()
 SessionInit = Annotated[Session, Depends(get_db)]
+AsyncSessionInit = Annotated[AsyncSession, Depends(get_async_db)]
 
 @router.get("/ws")
 async def get():
@@ -87,8 +92,8 @@ def  submission_window_time() -> datetime:
             return now.replace(minute= minute, second=0, microsecond=0)
 
 @router.post("/create-submission-window")
-def set_window(*, data: SubmissionWindowInput, session: SessionInit):
-    window = session.get(SubmissionWindow, 1)
+async def set_window(*, data: SubmissionWindowInput, session: AsyncSessionInit):
+    window = await session.get(SubmissionWindow, 1)
 
     if not window:
         try:
@@ -105,52 +110,114 @@ def set_window(*, data: SubmissionWindowInput, session: SessionInit):
         window.open_time = data.open_time
         window.close_time = data.close_time
 
-    session.commit()
-    session.refresh(window)
+    await session.commit()
+    await session.refresh(window)
+    await countdown.publish_change(window)
+    await response_cache.invalidate(WINDOW_TAG)
     return window
 
 
 @router.get("/get-submission-window")
-def get_window(session: SessionInit):
-    window = session.query(SubmissionWindow).all()
-    return window
+async def get_window(session: AsyncSessionInit, request: Request):
+    async def produce():
+        return (await session.exec(select(SubmissionWindow))).all()
+    return await response_cache.serve(request, (WINDOW_TAG,), produce)
 
 
 @router.delete("/remove-submission-window")
-def delete_window(session: SessionInit):
-    window = session.get(SubmissionWindow, 1)
+async def delete_window(session: AsyncSessionInit):
+    window = await session.get(SubmissionWindow, 1)
     if window:
-        session.delete(window)
-        session.commit()
+        await session.delete(window)
+        await session.commit()
+        await countdown.publish_change(None)
+        await response_cache.invalidate(WINDOW_TAG)
     return {"detail": "Submission window deleted"}
 
 @router.put("/submission-window/reset")
-def reset_window(session: SessionInit):
-    window = session.get(SubmissionWindow, 1)
+async def reset_window(session: AsyncSessionInit):
+    window = await session.get(SubmissionWindow, 1)
     if window:
         window.open_time = datetime.utcnow()
         window.close_time = datetime.utcnow()
-        session.commit()
-        session.refresh(window)
+        await session.commit()
+        await session.refresh(window)
+        await countdown.publish_change(window)
+        await response_cache.invalidate(WINDOW_TAG)
     return window
 
 @router.websocket("/ws/chat")
 async def chat_socket(websocket: WebSocket):
-    await manager.connect(websocket)
+    await manager.connect(websocket, CHAT)
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast(f"Chat message: {data}")
+            await manager.publish(CHAT, f"Chat message: {data}")
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
 @router.websocket("/ws/notifications")
 async def notifications_socket(websocket: WebSocket):
-    await manager.connect(websocket)
+    await manager.connect(websocket, NOTIFICATIONS)
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast(f"Notification: {data}")
+            await manager.publish(NOTIFICATIONS, f"Notification: {data}")
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
+
+# What /ws/subscribe hands out. Internal topics (orderbook.changed,
+# window.changed, cache.invalidated) are not on it and never reach sockets.
+PUBLIC_TOPICS = (CHAT, NOTIFICATIONS, ROOM, WINDOW)
+PUBLIC_TOPIC_PREFIXES = ("market.", "clearing.")
+PRIVATE_TOPICS = ("trades.",)
+
+async def socket_user(websocket: WebSocket):
+    try:
+        user = await run_in_threadpool(authenticate_and_get_user, websocket)
+        return user["user_id"]
+    except HTTPException:
+        return None
+
+def can_subscribe(topic: str, user_id) -> bool:
+    # trades.{trader_id} carries one trader's fills; only that trader may listen.
+    if topic.startswith(PRIVATE_TOPICS):
+        return user_id is not None and topic.split(".", 1)[1] == user_id
+    if topic.startswith(PUBLIC_TOPIC_PREFIXES):
+        return bool(topic.split(".", 1)[1])
+    return topic in PUBLIC_TOPICS
+
+@router.websocket("/ws/subscribe")
+async def subscribe_socket(websocket: WebSocket, topics: str = ""):
+    """Subscribe to topics given as ``?topics=a,b`` or sent as
+    ``{"action": "subscribe" | "unsubscribe", "topic": ...}``."""
+    await manager.connect(websocket)
+    user_id = await socket_user(websocket)
+
+    async def change(action, topic):
+        if action == "unsubscribe":
+            manager.unsubscribe(websocket, topic)
+        elif can_subscribe(topic, user_id):
+            manager.subscribe(websocket, topic)
+        else:
+            await manager.send_personal_message(json.dumps({"error": f"Not allowed to subscribe to {topic}"}), websocket)
+            return
+        await manager.send_personal_message(json.dumps({action: topic}), websocket)
+
+    try:
+        for topic in filter(None, topics.split(",")):
+            await change("subscribe", topic.strip())
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+                action, topic = data["action"], str(data["topic"])
+            except (ValueError, KeyError, TypeError):
+                await manager.send_personal_message(json.dumps({"error": "Expected {\"action\", \"topic\"}"}), websocket)
+                continue
+            if action not in ("subscribe", "unsubscribe"):
+                await manager.send_personal_message(json.dumps({"error": f"Unknown action {action}"}), websocket)
+                continue
+            await change(action, topic)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
@@ -165,36 +232,21 @@ async def echo_socket(websocket: WebSocket):
         manager.disconnect(websocket)
 
 @router.websocket("/ws/countdown")
-async def countdown_socket(*,
-                           websocket: WebSocket,
-                           session: SessionInit
-                           ) -> None:
-
-    await manager.connect(websocket)
-
-    window = session.get(SubmissionWindow, 1)
-
-    while True:
-        now = datetime.utcnow()
-        remaining = (window.close_time - now).total_seconds()
-
-        if remaining <= 0:
-            await websocket.send_json({"remaining": 0, "status": "closed"})
-            break
-
-        await websocket.send_json({
-            "remaining": remaining,
-            "status": "open"
-        })
-
-        await asyncio.sleep(1)
-
-
+async def countdown_socket(websocket: WebSocket) -> None:
+    # The shared ticker in modules.countdown sends the ticks; the socket
+    # only needs the current state straight away.
+    await manager.connect(websocket, WINDOW)
+    await manager.send_personal_message(countdown.message(), websocket)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        manager.disconnect(websocket)
 
 
 @router.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
-    await manager.connect(websocket)
+    await manager.connect(websocket, ROOM)
     
     welcome_msg = json.dumps({
         "message": f"Welcome {client_id}! You are connected.",
@@ -206,7 +258,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
         "message": f"{client_id} joined the chat",
         "timestamp": datetime.now().strftime("%H:%M:%S")
     })
-    await manager.broadcast(broadcast_msg)
+    await manager.publish(ROOM, broadcast_msg)
     
     try:
         while True:
@@ -218,7 +270,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                 "message": f"{client_id}: {data}",
                 "timestamp": datetime.now().strftime("%H:%M:%S")
             })
-            await manager.broadcast(response)
+            await manager.publish(ROOM, response)
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
@@ -226,4 +278,4 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             "message": f"{client_id} left the chat",
             "timestamp": datetime.now().strftime("%H:%M:%S")
         })
-        await manager.broadcast(disconnect_msg)
\ No newline at end of file
+        await manager.publish(ROOM, disconnect_msg)
\ No newline at end of file
@@ -1,34 +1,118 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import jwt
 from fastapi import HTTPException, Request 
-from clerk_backend_api import Clerk, AuthenticateRequestOptions
 from dotenv import load_dotenv
 
 load_dotenv()
 
+AUTHORIZED_PARTIES = [
+    "http://10.10.10.158:5173",
+    "http://172.20.10.4:5173",
+    "http://localhost:5173",
+    "https://onction-dashboard.netlify.app",
+]
+
+
+class TokenVerifier():
+    """Verifies Clerk session tokens locally.
+
+    The signing key is either the PEM public key in ``JWT_KEY`` (no network
+    at all) or the JWKS fetched from ``CLERK_JWKS_URL``, cached and refreshed
+    every ``jwks_ttl`` seconds. Verified claims are memoized in a bounded LRU
+    keyed by the token's SHA-256 until the token expires, so repeat requests
+    with the same session token skip signature verification.
+    """
+
+    def __init__(
+            self,
+            public_key: Optional[str] = None,
+            jwks_url: Optional[str] = None,
+            jwks_headers: Optional[Dict[str, str]] = None,
+            authorized_parties=AUTHORIZED_PARTIES,
+            jwks_ttl: float = 3600,
+            cache_size: int = 10000,
+            leeway: float = 5):
+        if public_key:
+            public_key = public_key.replace("\\n", "\n")
+        self.public_key = public_key
+        self.jwks_client = None
+        if not public_key and jwks_url:
+            self.jwks_client = jwt.PyJWKClient(jwks_url, cache_jwk_set=True, lifespan=jwks_ttl, headers=jwks_headers)
+        self.authorized_parties = set(authorized_parties or [])
+        self.cache_size = cache_size
+        self.leeway = leeway
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def signing_key(self, token: str):
+        if self.public_key:
+            return self.public_key
+        if self.jwks_client is None:
+            raise HTTPException(status_code=500, detail="Set JWT_KEY or CLERK_JWKS_URL to verify session tokens")
+        try:
+            return self.jwks_client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientError as error:
+            raise HTTPException(status_code=401, detail=f"Unknown signing key: {error}")
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        now = time.time()
+        with self._lock:
+            claims = self._cache.get(digest)
+            if claims is not None:
+                if claims["exp"] + self.leeway > now:
+                    self._cache.move_to_end(digest)
+                    return claims
+                del self._cache[digest]
+
+        try:
+            claims = jwt.decode(
+                token,
+                self.signing_key(token),
+                algorithms=["RS256"],
+                leeway=self.leeway,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.InvalidTokenError as error:
+            raise HTTPException(status_code=401, detail=f"Invalid session token: {error}")
+        azp = claims.get("azp")
+        if azp and self.authorized_parties and azp not in self.authorized_parties:
+            raise HTTPException(status_code=401, detail=f"Unauthorized party {azp}")
+
+        with self._lock:
+            self._cache[digest] = claims
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return claims
+
+
+def session_token(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return authorization[7:].strip()
+    return request.cookies.get("__session")
+
+
+verifier = TokenVerifier(
+    public_key=os.getenv("JWT_KEY"),
+    jwks_url=os.getenv("CLERK_JWKS_URL", "https://api.clerk.com/v1/jwks"),
+    jwks_headers={"Authorization": f"Bearer {os.getenv('CLERK_SECRET_KEY', '')}"},
+    jwks_ttl=float(os.getenv("JWKS_TTL", "3600")),
+    cache_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+)
+
+
 def authenticate_and_get_user(request: Request):
-    clerk_sdk = Clerk(bearer_auth=os.getenv("CLERK_SECRET_KEY"))
-    jwt_key=os.getenv("JWT_KEY")
-
-    try:
-        request_state = clerk_sdk.authenticate_request(
-            request,
-            AuthenticateRequestOptions(
-                authorized_parties=[
-                    "http://10.10.10.158:5173",
-                    "http://172.20.10.4:5173",
-                    " http://localhost:5173",
-                    "https://onction-dashboard.netlify.app"
-                    ],
-                jwt_key=jwt_key
-            )   
-        )
-        if request_state.is_signed_in:
-            user_id = request_state.payload.get("sub")
-            return {"user_id": user_id}
-        else:
-            raise HTTPException(status_code=401, detail="Not signed in")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    token = session_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not signed in")
+    claims = verifier.verify(token)
+    return {"user_id": claims.get("sub")}
 
 
 
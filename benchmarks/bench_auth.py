@@ -0,0 +1,59 @@
+"""Per-request auth overhead of ``authenticate_and_get_user``.
+
+Signs session tokens with a locally generated RSA key, so no Clerk account or
+network is needed. Compares full signature verification (cold cache) with the
+memoized path a repeat request takes.
+"""
+import argparse
+import time
+
+import common  # noqa: F401  puts app/ on sys.path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from starlette.requests import Request
+
+from utils import utils
+
+
+def keypair():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return private_key, public_pem
+
+
+def request_with(token):
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+def per_call_us(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+
+    private_key, public_pem = keypair()
+    token = jwt.encode(
+        {"sub": "user_1", "azp": "http://localhost:5173", "exp": int(time.time()) + 3600},
+        private_key, algorithm="RS256")
+    request = request_with(token)
+
+    utils.verifier = utils.TokenVerifier(public_key=public_pem)
+    cold = utils.TokenVerifier(public_key=public_pem, cache_size=0)
+
+    assert utils.authenticate_and_get_user(request) == {"user_id": "user_1"}
+    print(f"{'signature verification per request':<40} {per_call_us(lambda: cold.verify(token), args.calls):8.1f} us")
+    print(f"{'cached claims per request':<40} "
+          f"{per_call_us(lambda: utils.authenticate_and_get_user(request), args.calls):8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
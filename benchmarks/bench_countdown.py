@@ -0,0 +1,78 @@
+"""CPU cost of ``/ws/countdown`` with many connected clients.
+
+Connects ``--clients`` in-process sockets through the real
+``countdown_socket`` handler, opens a submission window in memory and lets
+the shared ticker run for ``--duration`` seconds. Prints ticks delivered per
+client and the CPU time the worker spent per tick and per second.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import common  # noqa: F401  puts app/ on sys.path
+
+from fastapi import WebSocketDisconnect
+
+from modules.countdown import countdown
+from routes.web_socket import countdown_socket
+
+
+class CountingSocket():
+    def __init__(self):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self) -> str:
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_text(self, message: str):
+        self.received += 1
+
+    async def close(self, code: int = 1000):
+        self.inbox.put_nowait(None)
+
+
+async def run(clients: int, duration: float):
+    countdown.ticker = asyncio.create_task(countdown.run())
+    sockets = [CountingSocket() for _ in range(clients)]
+    handlers = [asyncio.create_task(countdown_socket(socket)) for socket in sockets]
+    await asyncio.sleep(0.5)
+
+    countdown.set_window({
+        "open_time": datetime.utcnow().isoformat(),
+        "close_time": (datetime.utcnow() + timedelta(seconds=duration + 60)).isoformat(),
+    })
+    before = sum(socket.received for socket in sockets)
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.sleep(duration)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    ticks = (sum(socket.received for socket in sockets) - before) / clients
+
+    for socket in sockets:
+        socket.inbox.put_nowait(None)
+    await asyncio.gather(*handlers)
+    await countdown.stop()
+
+    print(f"clients {clients}, {wall:.1f}s")
+    print(f"{'ticks per client':<30} {ticks:8.1f}")
+    print(f"{'CPU per tick':<30} {cpu / max(ticks, 1) * 1000:8.1f} ms")
+    print(f"{'CPU utilisation':<30} {cpu / wall * 100:8.1f} %")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=20000)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.duration))
+
+
+if __name__ == "__main__":
+    main()
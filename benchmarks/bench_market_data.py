@@ -0,0 +1,63 @@
+"""``/market-data/`` latency as trade history grows.
+
+Grows one scratch SQLite database a delivery day at a time (``--orders``
+orders per day, cleared with the local engine, rollup refreshed) and, at
+each ``--days`` checkpoint, times market data for the latest day read from
+the rollup and aggregated on the fly.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "market_data.db")
+
+from common import synthetic_payload  # noqa: E402  puts app/ on sys.path
+
+from sqlmodel import Session  # noqa: E402
+
+from db.db import engine, run_migrations  # noqa: E402
+from modules.clearing import load_clearing_payload  # noqa: E402
+from modules.local_match import LocalMatch  # noqa: E402
+from modules.market_data import Marketdata, aggregate_day, refresh_market_summary  # noqa: E402
+from modules.order_ingest import ingest_orders  # noqa: E402
+from modules.trade_store import save_trades  # noqa: E402
+
+FIRST_DAY = date(2024, 1, 1)
+
+
+def per_call_ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, nargs="+", default=[10, 100, 365])
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    run_migrations()
+    with Session(engine) as session:
+        seeded = 0
+        for checkpoint in sorted(args.days):
+            for offset in range(seeded, checkpoint):
+                day = FIRST_DAY + timedelta(days=offset)
+                ingest_orders(session, synthetic_payload(args.orders, day, seed=offset))
+                save_trades(session, LocalMatch().match(load_clearing_payload(session, day)))
+                refresh_market_summary(session, [day])
+            seeded = checkpoint
+            latest = FIRST_DAY + timedelta(days=checkpoint - 1)
+
+            rollup = per_call_ms(lambda: Marketdata().generate_market_data(session), args.repeat)
+            live = per_call_ms(lambda: aggregate_day(session, latest), args.repeat)
+            print(f"{checkpoint:>5} days ({checkpoint * args.orders:>7} orders)"
+                  f"   rollup {rollup:7.2f} ms   on the fly {live:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Clearing time of the in-process matching engine for a single delivery day,
+run as one payload and sharded per timeslot over a process pool."""
+import argparse
+import asyncio
+
+from common import synthetic_payload, timed
+
+from modules.local_match import LocalMatch
+from modules.shard_match import ShardedMatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--slots", type=int, default=24)
+    args = parser.parse_args()
+
+    for count in args.orders:
+        payload = synthetic_payload(count, slots=args.slots)
+        with timed(f"LocalMatch {count} orders / {args.slots} slots"):
+            trades = LocalMatch().match(payload)
+        print(f"{'':<40} {len(trades)} trades")
+        with timed(f"ShardedMatch {count} orders / {args.slots} slots"):
+            trades, _ = asyncio.run(ShardedMatch(LocalMatch()).trigger_matching_engine({}, payload))
+        print(f"{'':<40} {len(trades)} trades on {ShardedMatch.workers} workers")
+    ShardedMatch.shutdown()
+
+
+if __name__ == "__main__":
+    main()
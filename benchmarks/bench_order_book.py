@@ -0,0 +1,62 @@
+"""In-memory order book: startup rebuild and depth reads.
+
+Seeds ``--orders`` synthetic orders per day for two days into a scratch
+SQLite database, then times ``order_book.load`` and ``order_book.depth``.
+The depth is checked against the open quantity the database holds.
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "order_book.db")
+
+from common import synthetic_payload, timed  # noqa: E402  puts app/ on sys.path
+
+from sqlmodel import Session  # noqa: E402
+
+from db.db import engine, run_migrations  # noqa: E402
+from modules.clearing import load_clearing_payload  # noqa: E402
+from modules.order_book import order_book, remaining  # noqa: E402
+from modules.order_ingest import ingest_orders  # noqa: E402
+
+# The book keeps today and later days only.
+DAY = date.today() + timedelta(days=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    run_migrations()
+    with Session(engine) as session:
+        ingest_orders(session, synthetic_payload(args.orders, DAY))
+        ingest_orders(session, synthetic_payload(args.orders, DAY + timedelta(days=1), seed=8))
+
+        with timed(f"rebuild book ({2 * args.orders} orders)"):
+            order_book.load(session)
+        from_db = load_clearing_payload(session, DAY)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        depth = order_book.depth(DAY)
+    levels = sum(len(slot["bids"]) + len(slot["offers"]) for slot in depth)
+    print(f"{f'depth x{args.repeat}, {levels} levels':<40} {time.perf_counter() - start:8.3f}s")
+
+    expected = Counter()
+    for order in from_db:
+        expected[(str(order["timeslot"]), order["order_type"])] += remaining(order)
+    got = Counter()
+    for slot in depth:
+        for side, order_type in (("bids", "BUY"), ("offers", "SELL")):
+            got[(str(slot["timeslot"]), order_type)] += sum(level["quantity"] for level in slot[side])
+    assert +expected == +got, "depth differs from the database"
+    print(f"depth matches the database ({len(from_db)} orders)")
+
+
+if __name__ == "__main__":
+    main()
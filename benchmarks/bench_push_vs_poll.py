@@ -0,0 +1,124 @@
+"""Database read load around a clearing: dashboards polling vs. push events.
+
+Runs the app in-process on a scratch SQLite database with the local matching
+engine. In ``poll`` mode every trader polls the Disco and Genco trade routes
+every ``--interval`` seconds; in ``push`` mode every trader is subscribed to
+``trades.{trader_id}`` instead. Each mode triggers one clearing and reports
+the SQL statements run while the dashboards wait, and how long traders took
+to learn about their trades.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "push_vs_poll.db")
+os.environ["MATCHING_ENGINE"] = "local"
+
+from common import synthetic_payload  # noqa: E402  puts app/ on sys.path
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from db.db import async_engine, engine, run_migrations  # noqa: E402
+from main import app  # noqa: E402
+from modules.order_ingest import ingest_orders  # noqa: E402
+from modules.websocket_connection import manager, trades_topic  # noqa: E402
+
+TRADERS = [f"user_{index}" for index in range(50)]
+
+
+class SqlCounter():
+    def __init__(self):
+        self.selects = self.statements = 0
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, "before_cursor_execute", self.count)
+
+    def count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.selects += 1
+
+
+class TraderSocket():
+    def __init__(self):
+        self.first_event = None
+
+    async def send_text(self, message: str):
+        if self.first_event is None:
+            self.first_event = time.perf_counter()
+
+
+async def poll(client, trader_id, clearing, seen, interval, stop):
+    while not stop.is_set():
+        buys = await client.get("/Disco-Dashboard/Trades/x", params={"buyer_id": trader_id})
+        sells = await client.get("/Genco-Dashboard/Trades/x", params={"seller_id": trader_id})
+        got_trades = buys.status_code == 200 or sells.status_code == 200
+        if clearing.done() and got_trades and trader_id not in seen:
+            seen[trader_id] = time.perf_counter()
+        await asyncio.sleep(interval)
+
+
+async def run_mode(mode, client, counter, delivery_day, interval, duration):
+    stop = asyncio.Event()
+    clearing = asyncio.get_running_loop().create_future()
+    seen, sockets, pollers = {}, {}, []
+    if mode == "poll":
+        pollers = [asyncio.create_task(poll(client, trader, clearing, seen, interval, stop)) for trader in TRADERS]
+    else:
+        for trader in TRADERS:
+            sockets[trader] = TraderSocket()
+            manager.register(sockets[trader], trades_topic(trader))
+
+    await asyncio.sleep(interval)
+    selects, statements = counter.selects, counter.statements
+    start = time.perf_counter()
+    response = await client.post("/tradeclearing/trigger_matching_engine", params={"date": str(delivery_day), "wait": True}, timeout=None)
+    cleared = time.perf_counter()
+    clearing.set_result(True)
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*pollers)
+    for socket in sockets.values():
+        seen_at = socket.first_event
+        if seen_at is not None:
+            seen[id(socket)] = seen_at
+        manager.disconnect(socket)
+
+    # From the start of the request: push events go out before the response does.
+    waits = [(at - start) * 1000 for at in seen.values()]
+    print(f"{mode}: clearing {response.status_code} in {(cleared - start) * 1000:.0f} ms")
+    print(f"{'  SELECTs while waiting':<34} {counter.selects - selects:8d}")
+    print(f"{'  SQL statements while waiting':<34} {counter.statements - statements:8d}")
+    print(f"{'  traders notified':<34} {len(waits):8d}")
+    if waits:
+        print(f"{'  time to notice, mean':<34} {statistics.mean(waits):8.1f} ms since clearing started")
+
+
+async def main_async(args):
+    run_migrations()
+    with Session(engine) as session:
+        for delivery_day in (date(2025, 1, 1), date(2025, 1, 2)):
+            ingest_orders(session, synthetic_payload(args.orders, delivery_day))
+    counter = SqlCounter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run_mode("poll", client, counter, date(2025, 1, 1), args.interval, args.duration)
+        await run_mode("push", client, counter, date(2025, 1, 2), args.interval, args.duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between polls per trader")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to watch after the clearing")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Re-clearing cost after a few amendments: the whole open book vs. only the changed timeslots.
+
+Seeds ``--orders`` orders of one day in 24 timeslots into a scratch SQLite
+file and clears it. Then, for each ``--amend`` count, reprices that
+many random orders the way ``update_bid`` does (new price, revision + 1)
+and times the incremental re-clear: ``load_changed_payload`` (the open book
+of the changed timeslots), the local engine and ``save_clearing``. For reference it
+first times a re-clear of the unchanged day's whole open book, the least
+every clearing used to cost.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "reclearing.db")
+
+from common import synthetic_payload  # noqa: E402  puts app/ on sys.path
+
+from sqlalchemy import bindparam, select, update  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from db.db import engine, run_migrations  # noqa: E402
+from models import Order  # noqa: E402
+from modules.clearing import load_changed_payload, load_clearing_payload  # noqa: E402
+from modules.local_match import LocalMatch  # noqa: E402
+from modules.order_ingest import ingest_orders  # noqa: E402
+from modules.trade_store import save_clearing  # noqa: E402
+
+DAY = date(2025, 1, 1)
+
+orders = Order.__table__
+
+
+def clear(session, incremental: bool):
+    start = time.perf_counter()
+    if incremental:
+        payload, cleared = load_changed_payload(session, DAY)
+    else:
+        payload, cleared = load_clearing_payload(session, DAY), []
+    trades, _ = save_clearing(session, LocalMatch().match(payload) if payload else [], cleared)
+    return (time.perf_counter() - start) * 1000, len(payload), len(trades)
+
+
+def amend(session, count: int, rng: random.Random):
+    if not count:
+        return
+    refs = session.execute(select(orders.c.order_ref).where(orders.c.delivery_day == DAY)).scalars().all()
+    session.execute(
+        update(orders)
+        .where(orders.c.order_ref == bindparam("ref"))
+        .values(price=bindparam("price"), revision=orders.c.revision + 1),
+        [{"ref": ref, "price": rng.uniform(2000, 9000)} for ref in rng.sample(refs, count)])
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--amend", type=int, nargs="+", default=[0, 1, 10, 100, 1000])
+    args = parser.parse_args()
+
+    run_migrations()
+    rng = random.Random(7)
+    with Session(engine) as session:
+        ingest_orders(session, synthetic_payload(args.orders, DAY))
+        ms, sent, trades = clear(session, incremental=True)
+        print(f"first clearing          {sent:>7} orders sent {ms:9.1f} ms   {trades:>6} trades")
+        ms, sent, trades = clear(session, incremental=False)
+        print(f"full re-clear            {sent:>7} orders sent {ms:9.1f} ms   {trades:>6} trades")
+        for count in args.amend:
+            amend(session, count, rng)
+            ms, sent, trades = clear(session, incremental=True)
+            print(f"{count:>5} amended, re-clear {sent:>7} orders sent {ms:9.1f} ms   {trades:>6} trades")
+
+
+if __name__ == "__main__":
+    main()
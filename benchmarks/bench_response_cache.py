@@ -0,0 +1,74 @@
+"""Read-heavy routes with and without the response cache.
+
+Runs the app in-process on a scratch SQLite database with the local matching
+engine: seeds and clears ``--orders`` orders, then requests each route
+``--repeat`` times as a cold read (cache invalidated first), a cached read,
+and a conditional read with ``If-None-Match``. Ends with the cache metrics.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "response_cache.db")
+os.environ["MATCHING_ENGINE"] = "local"
+
+from common import synthetic_payload  # noqa: E402  puts app/ on sys.path
+
+import httpx  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from db.db import engine, run_migrations  # noqa: E402
+from main import app  # noqa: E402
+from modules.order_ingest import ingest_orders  # noqa: E402
+from modules.response_cache import MARKET, TRADES, WINDOW, response_cache  # noqa: E402
+
+DAY = date(2025, 1, 1)
+ROUTES = [
+    ("/market-data/", MARKET),
+    ("/tradeclearing/get_all_trades?limit=500", TRADES),
+    ("/Disco-Dashboard/Trades/x?buyer_id=user_1", TRADES),
+    ("/get-submission-window", WINDOW),
+]
+
+
+async def per_call_ms(client, url, repeat, headers=None, invalidate=None):
+    elapsed = 0.0
+    for _ in range(repeat):
+        if invalidate:
+            await response_cache.invalidate(invalidate)
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        elapsed += time.perf_counter() - start
+    return elapsed / repeat * 1000, response
+
+
+async def main_async(args):
+    run_migrations()
+    with Session(engine) as session:
+        ingest_orders(session, synthetic_payload(args.orders, DAY))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/tradeclearing/trigger_matching_engine", params={"date": str(DAY), "wait": True}, timeout=None)
+        print(f"{'route':<46} {'cold':>9} {'cached':>9} {'304':>9}")
+        for url, tag in ROUTES:
+            cold, response = await per_call_ms(client, url, args.repeat, invalidate=tag)
+            cached, _ = await per_call_ms(client, url, args.repeat)
+            etag = {"If-None-Match": response.headers.get("etag", "")}
+            conditional, _ = await per_call_ms(client, url, args.repeat, headers=etag)
+            print(f"{url:<46} {cold:7.2f}ms {cached:7.2f}ms {conditional:7.2f}ms")
+        print((await client.get("/cache/metrics")).json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""List response cost: ORM objects through FastAPI's encoders vs. plain rows through orjson.
+
+Seeds ``--rows`` orders and about as many trades per size into a scratch
+SQLite file, then times, for each table:
+
+- ``orm``: ``session.exec(select(Model))`` and what FastAPI does with the
+  result: ``response_model`` validation + Pydantic JSON for orders
+  (``List[ShowOrder]``), ``jsonable_encoder`` + ``json.dumps`` for trades;
+- ``rows``: ``select_as`` column tuples rendered by ``rows_response``.
+
+Both bodies are checked to decode to the same JSON.
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from common import synthetic_payload
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from models import Order, ShowOrder, Trades
+from modules.local_match import LocalMatch
+from modules.order_ingest import ingest_orders
+from modules.serialization import rows_response, select_as
+from modules.trade_store import save_trades
+
+SHOW_ORDERS = TypeAdapter(List[ShowOrder])
+
+
+def orm_orders(session):
+    orders = session.exec(select(Order)).all()
+    return SHOW_ORDERS.dump_json(SHOW_ORDERS.validate_python(orders, from_attributes=True))
+
+
+def orm_trades(session):
+    trades = session.exec(select(Trades)).all()
+    return JSONResponse(jsonable_encoder(trades)).body
+
+
+def row_bodies(session, model, table):
+    return rows_response(session.exec(select_as(model, table)).all()).body
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    body = fn()
+    return (time.perf_counter() - start) * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.rows:
+            engine = create_engine(f"sqlite:///{Path(tmp) / f'serialization_{count}.db'}")
+            SQLModel.metadata.create_all(engine)
+            with Session(engine) as session:
+                payload = synthetic_payload(count)
+                ingest_orders(session, payload)
+                save_trades(session, LocalMatch().match(payload))
+
+                for label, model, table, orm in (("orders", ShowOrder, Order.__table__, orm_orders),
+                                                 ("trades", Trades, Trades.__table__, orm_trades)):
+                    slow, old_body = timed_ms(lambda: orm(session))
+                    fast, new_body = timed_ms(lambda: row_bodies(session, model, table))
+                    assert json.loads(old_body) == json.loads(new_body), f"{label} bodies differ"
+                    rows = len(json.loads(new_body))
+                    print(f"{label:>7} {rows:>7} rows   orm {slow:8.1f} ms ({rows / slow * 1000:>9,.0f} rows/s)"
+                          f"   rows {fast:8.1f} ms ({rows / fast * 1000:>9,.0f} rows/s)   x{slow / fast:.1f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
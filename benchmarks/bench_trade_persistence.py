@@ -0,0 +1,72 @@
+"""Commit time of a clearing result: the old per-trade ORM path vs. ``save_trades``.
+
+Each size runs against a fresh SQLite file holding the day's orders.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+from common import synthetic_payload, timed
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from models import Order, Status, Trades
+from modules.local_match import LocalMatch
+from modules.trade_store import save_trades
+
+
+def legacy_save_trades(session, data):
+    """The write path ``trigger_matching_engine`` used before bulk persistence."""
+    create_trades = []
+    for new_trade in data:
+        new_trade = Trades.model_validate(new_trade)
+        create_trades.append(new_trade)
+        buyer_ref = session.exec(select(Order).where(Order.order_ref == new_trade.buyer_order_ref)).all()
+        seller_ref = session.exec(select(Order).where(Order.order_ref == new_trade.seller_order_ref)).all()
+        for order_status in [*buyer_ref, *seller_ref]:
+            order_status.status = Status.MATCHED
+            order_status.fully_matched = True
+            session.add(order_status)
+    session.add_all(create_trades)
+    session.commit()
+    return create_trades
+
+
+def seeded_engine(path, payload):
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.execute(Order.__table__.insert(), [Order.model_validate(row).model_dump() for row in payload])
+        session.commit()
+    return engine
+
+
+def trades_for(count):
+    # Roughly 0.6 trades per order with the synthetic book.
+    payload = synthetic_payload(int(count / 0.55))
+    trades = LocalMatch().match(payload)[:count]
+    return payload, trades
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trades", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000,
+                        help="skip the per-trade path above this size, it scales with round-trips")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.trades:
+            payload, trades = trades_for(count)
+            paths = {"bulk": save_trades}
+            if count <= args.legacy_max:
+                paths["legacy"] = legacy_save_trades
+            for name, save in paths.items():
+                engine = seeded_engine(Path(tmp) / f"{name}-{count}.db", payload)
+                with Session(engine) as session, timed(f"{name:<6} {len(trades)} trades"):
+                    save(session, trades)
+                engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Fan-out latency of ``/ws/notifications`` with many simulated clients.
+
+Each client is an in-process stand-in for a WebSocket that runs the real
+``notifications_socket`` handler, so the route and ``ConnectionManager`` are
+exercised without opening sockets. One client sends a message per round and
+the script reports percentiles of the time until each client has it.
+``--slow`` makes a share of the clients stall on every send to show that they
+no longer hold up everyone else; ``--sequential`` measures the old hub.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import common  # noqa: F401  puts app/ on sys.path
+
+from fastapi import WebSocketDisconnect
+
+from modules.websocket_connection import manager
+from routes.web_socket import notifications_socket
+
+
+class Round():
+    def __init__(self, expected: str, clients: int):
+        self.expected = expected
+        self.pending = clients
+        self.latencies: list[float] = []
+        self.done = asyncio.Event()
+        self.start = time.perf_counter()
+
+    def delivered(self, message: str):
+        if message != self.expected:
+            return
+        self.latencies.append(time.perf_counter() - self.start)
+        self.pending -= 1
+        if self.pending == 0:
+            self.done.set()
+
+
+class SimulatedSocket():
+    current: Round | None = None
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.inbox: asyncio.Queue = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self) -> str:
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect()
+        return message
+
+    async def send_text(self, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if not self.delay and SimulatedSocket.current is not None:
+            SimulatedSocket.current.delivered(message)
+
+    async def close(self, code: int = 1000):
+        self.inbox.put_nowait(None)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+async def sequential_broadcast(message: str):
+    # The previous hub: one awaited send after another.
+    for websocket in list(manager.active_connections):
+        await websocket.send_text(message)
+
+
+async def run(clients: int, rounds: int, slow: float, slow_delay: float, sequential: bool):
+    if sequential:
+        manager.broadcast = sequential_broadcast
+    slow_count = int(clients * slow)
+    # Slow clients first: the worst position for a sequential broadcast.
+    sockets = [SimulatedSocket(slow_delay if i < slow_count else 0.0) for i in range(clients)]
+    handlers = [asyncio.create_task(notifications_socket(socket)) for socket in sockets]
+    await asyncio.sleep(0)
+    sender = sockets[-1]
+
+    latencies, elapsed = [], []
+    for round_ in range(rounds):
+        text = f"round {round_}"
+        SimulatedSocket.current = current = Round(f"Notification: {text}", clients - slow_count)
+        sender.inbox.put_nowait(text)
+        await asyncio.wait_for(current.done.wait(), 120)
+        elapsed.append(time.perf_counter() - current.start)
+        latencies.extend(current.latencies)
+
+    for socket in sockets:
+        socket.inbox.put_nowait(None)
+    await asyncio.gather(*handlers)
+
+    ms = [value * 1000 for value in latencies]
+    mode = "sequential" if sequential else "queued"
+    print(f"{mode}: clients {clients}, slow {slow_count} ({slow_delay * 1000:.0f} ms/send), rounds {rounds}")
+    print(f"{'delivered to fast clients':<30} {len(ms)}")
+    print(f"{'round complete mean':<30} {statistics.mean(elapsed) * 1000:8.2f} ms")
+    for q in (50, 90, 99, 100):
+        print(f"{f'fan-out latency p{q}':<30} {percentile(ms, q):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--slow", type=float, default=0.01, help="share of clients that stall on every send")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds a slow client takes per send")
+    parser.add_argument("--sequential", action="store_true", help="measure the old one-send-at-a-time broadcast")
+    args = parser.parse_args()
+    asyncio.run(run(args.clients, args.rounds, args.slow, args.slow_delay, args.sequential))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Matching engine wire formats: JSON vs. columnar msgpack (``modules.wire``).
+
+Builds ``--orders`` clearing payload rows (the ``book_entry`` shape) and the
+trades ``LocalMatch`` makes of them, then times each leg of a clearing call
+and reports the body sizes:
+
+- payload encode (``TriggerMatch``) and decode (the engine);
+- trades encode (the engine) and decode (``TriggerMatch``), plus the
+  ``trade_rows`` step of ``save_clearing``: ``TradeBase`` validation of
+  JSON rows, none for the already typed columnar ones;
+- a full round trip through ``TriggerMatch`` to the fake engine in-process.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from common import synthetic_payload
+
+import httpx
+
+from modules import fake_matching_server, wire
+from modules.local_match import LocalMatch
+from modules.order_book import book_entry
+from modules.order_ingest import prepare_order
+from modules.trade_store import trade_rows
+from modules.trigger_match import TriggerMatch
+
+
+def timed_ms(fn, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+async def round_trip_ms(payload, wire_format: str, repeat: int) -> float:
+    TriggerMatch.wire_format = wire_format
+    TriggerMatch._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_matching_server.app),
+                                             timeout=None)
+    TriggerMatch.url = "http://engine/v1/match"
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        trades = await TriggerMatch().trigger_matching_engine({"clearing_date": "2025-01-01"}, payload)
+        trade_rows(trades)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    await TriggerMatch.aclose()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if not wire.available():
+        raise SystemExit("msgpack is not installed")
+
+    payload = [book_entry(prepare_order(row)) for row in synthetic_payload(args.orders)]
+    trades = LocalMatch().match(payload)
+    print(f"{len(payload)} orders, {len(trades)} trades")
+
+    legs = {
+        "payload encode": (lambda: json.dumps(payload).encode(),
+                           lambda: wire.encode_rows(payload, wire.PAYLOAD_SCHEMA)),
+        "trades encode": (lambda: json.dumps(trades).encode(),
+                          lambda: wire.encode_rows(trades, wire.TRADE_SCHEMA)),
+    }
+    bodies = {}
+    for leg, (as_json, as_columns) in legs.items():
+        json_ms, json_body = timed_ms(as_json, args.repeat)
+        columns_ms, columns_body = timed_ms(as_columns, args.repeat)
+        bodies[leg.split()[0]] = (json_body, columns_body)
+        print(f"{leg:<26} json {json_ms:8.1f} ms   columns {columns_ms:8.1f} ms   x{json_ms / columns_ms:.1f}")
+
+    json_body, columns_body = bodies["payload"]
+    json_ms, _ = timed_ms(lambda: json.loads(json_body), args.repeat)
+    columns_ms, _ = timed_ms(lambda: wire.decode_rows(columns_body, wire.PAYLOAD_SCHEMA), args.repeat)
+    print(f"{'payload decode':<26} json {json_ms:8.1f} ms   columns {columns_ms:8.1f} ms   x{json_ms / columns_ms:.1f}")
+
+    json_body, columns_body = bodies["trades"]
+    json_ms, _ = timed_ms(lambda: trade_rows(json.loads(json_body)), args.repeat)
+    columns_ms, _ = timed_ms(lambda: trade_rows(wire.decode_rows(columns_body, wire.TRADE_SCHEMA, typed=True)),
+                             args.repeat)
+    print(f"{'trades decode + validate':<26} json {json_ms:8.1f} ms   columns {columns_ms:8.1f} ms   x{json_ms / columns_ms:.1f}")
+
+    for leg, (json_body, columns_body) in bodies.items():
+        print(f"{leg + ' size':<26} json {len(json_body) / 1e6:8.2f} MB   columns {len(columns_body) / 1e6:8.2f} MB"
+              f"   x{len(json_body) / len(columns_body):.1f}")
+
+    json_ms = asyncio.run(round_trip_ms(payload, "json", args.repeat))
+    columns_ms = asyncio.run(round_trip_ms(payload, "columns", args.repeat))
+    print(f"{'round trip':<26} json {json_ms:8.1f} ms   columns {columns_ms:8.1f} ms   x{json_ms / columns_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
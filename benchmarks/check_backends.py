@@ -0,0 +1,156 @@
+"""Check the database-specific paths on SQLite and PostgreSQL.
+
+Runs against ``--database-url`` (a scratch SQLite file by default; for
+PostgreSQL pass a throwaway database, e.g. the container from the README).
+The schema is migrated to head, then each check prints ``ok`` or ``FAIL``
+and the script exits non-zero if any failed:
+
+- the partial indexes exist with their ``WHERE`` clause, and the planner
+  answers the changed-timeslots query from ``ix_order_uncleared_delivery_day``;
+- ``insert_new`` (``ON CONFLICT DO NOTHING``): replaying a clearing result
+  stores no trade twice;
+- ``ux_clearing_job_active_day``: a second clearing of a day with a job
+  still active gets that job back, and a re-clear with no changes sends
+  nothing;
+- timestamps: the ``clearing_job`` and ``market_summary`` times read back
+  as the aware UTC instants written. PostgreSQL sessions run with a non-UTC
+  ``TimeZone`` here, so a column without a time zone, which would keep the
+  session's local time, shows up as a shifted value.
+
+Every run uses its own delivery days, so it can be repeated on one database.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--database-url", default="sqlite:///" + os.path.join(tempfile.mkdtemp(), "backends.db"))
+parser.add_argument("--timezone", default="Africa/Lagos", help="PostgreSQL session time zone (not UTC)")
+args = parser.parse_args()
+os.environ["DATABASE_URL"] = args.database_url
+os.environ["MATCHING_ENGINE"] = "local"
+
+import asyncio  # noqa: E402
+
+from common import synthetic_payload  # noqa: E402  puts app/ on sys.path
+
+from sqlalchemy import event, func, select, text  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from db import db  # noqa: E402
+from models import ClearingJob, MarketSummary, Order, Trades  # noqa: E402
+from modules.clearing import clearing_jobs, load_clearing_payload, uncleared  # noqa: E402
+from modules.local_match import LocalMatch  # noqa: E402
+from modules.order_ingest import ingest_orders  # noqa: E402
+from modules.trade_store import save_clearing  # noqa: E402
+
+PARTIAL_INDEXES = {"ix_order_uncleared_delivery_day": "order", "ux_clearing_job_active_day": "clearing_job"}
+# Longest a row may take from being written to being checked.
+CLOCK_SLACK = timedelta(minutes=5)
+
+results = []
+
+
+def check(name: str, passed: bool, detail: str = ""):
+    results.append(passed)
+    print(f"{'ok' if passed else 'FAIL':<5} {name:<44} {detail}")
+
+
+def session_timezone(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"SET TIME ZONE '{args.timezone}'")
+    cursor.close()
+
+
+def index_definition(session: Session, name: str) -> str:
+    if session.bind.dialect.name == "postgresql":
+        query = text("SELECT indexdef FROM pg_indexes WHERE indexname = :name")
+    else:
+        query = text("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = :name")
+    return session.execute(query, {"name": name}).scalar() or ""
+
+
+def query_plan(session: Session, statement) -> str:
+    if session.bind.dialect.name == "postgresql":
+        # A scratch table is small enough for a sequential scan to win; ask
+        # whether the index can answer the query at all.
+        session.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = session.execute(text(f"EXPLAIN {statement.compile(session.bind, compile_kwargs={'literal_binds': True})}"))
+    else:
+        rows = session.execute(text(f"EXPLAIN QUERY PLAN {statement.compile(session.bind, compile_kwargs={'literal_binds': True})}"))
+    return " | ".join(str(row[-1]) for row in rows)
+
+
+def check_indexes(session: Session, day: date):
+    for name, table in PARTIAL_INDEXES.items():
+        definition = index_definition(session, name)
+        check(f"partial index {name}", " WHERE " in definition.upper(), definition or f"missing on {table}")
+    plan = query_plan(session, select(Order.timeslot).where(Order.delivery_day == day, uncleared(Order)))
+    session.rollback()
+    check("changed timeslots use the partial index", "ix_order_uncleared_delivery_day" in plan, plan)
+
+
+def check_replay(session: Session, day: date):
+    ingest_orders(session, synthetic_payload(400, day, slots=4))
+    data = LocalMatch().match(load_clearing_payload(session, day))
+    first, _ = save_clearing(session, data)
+    again, _ = save_clearing(session, data)
+    stored = session.execute(select(func.count()).select_from(Trades).where(Trades.delivery_day == day)).scalar()
+    check("insert_new skips trades already stored", len(first) == len(data) == stored and not again,
+          f"{len(data)} trades, {len(first)} then {len(again)} inserted, {stored} stored")
+
+
+async def clear_twice(day: date):
+    job, created = await clearing_jobs.submit(day)
+    blocked, blocked_created = await clearing_jobs.submit(day)
+    await clearing_jobs.wait(job.id)
+    again, _ = await clearing_jobs.submit(day)
+    await clearing_jobs.wait(again.id)
+    return job, created, blocked, blocked_created, again
+
+
+def check_clearing(session: Session, day: date):
+    ingest_orders(session, synthetic_payload(400, day, slots=4))
+    job, created, blocked, blocked_created, again = asyncio.run(clear_twice(day))
+    check("one active clearing job per day", created and not blocked_created and blocked.id == job.id,
+          f"second submit got {'the active job' if blocked.id == job.id else blocked.id}")
+    session.expire_all()
+    first, second = session.get(ClearingJob, job.id), session.get(ClearingJob, again.id)
+    check("clearing job succeeded", first.status == "succeeded", f"{first.status}: {first.orders} orders sent, "
+          f"{first.trades} trades, version {first.version}; {first.error or ''}")
+    check("re-clear without changes sends nothing", second.status == "succeeded" and second.orders == 0,
+          f"{second.status}: {second.orders} orders sent")
+
+    now = datetime.now(timezone.utc)
+    stamps = {f"clearing_job.{name}": getattr(first, name) for name in ("created_at", "started_at", "finished_at")}
+    stamps["market_summary.updated_at"] = session.execute(
+        select(func.max(MarketSummary.updated_at)).where(MarketSummary.delivery_day == day)).scalar()
+    for name, value in stamps.items():
+        current = value is not None and value.tzinfo is not None and abs(now - value) < CLOCK_SLACK
+        check(f"{name} keeps its UTC instant", current, f"{value} (now {now:%Y-%m-%d %H:%M:%S} UTC)")
+
+
+def main():
+    backend = db.engine.dialect.name
+    if backend == "postgresql":
+        event.listen(db.engine, "connect", session_timezone)
+        event.listen(db.async_engine.sync_engine, "connect", session_timezone)
+    db.run_migrations()
+    print(f"{backend}: {db.engine.url.render_as_string(hide_password=True)}"
+          + (f", session time zone {args.timezone}" if backend == "postgresql" else ""))
+
+    # Far-off random days: a rerun on the same database starts from empty days.
+    base = date(2100, 1, 1) + timedelta(days=random.randrange(300_000))
+    with Session(db.engine) as session:
+        check_indexes(session, base)
+        check_replay(session, base)
+        check_clearing(session, base + timedelta(days=1))
+    db.engine.dispose()
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
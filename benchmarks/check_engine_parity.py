@@ -0,0 +1,97 @@
+"""Assert that ``LocalMatch`` clears like the remote matching engine.
+
+Each file in ``fixtures/engine`` holds a clearing request (``params`` and
+``payload``) and the trades the engine answered. The request is replayed
+through ``LocalMatch.match`` and both trade lists are compared as fills:
+buyer and seller order, quantity, price, delivery day and timeslot. Trade
+and matching ids and timestamps are the engine's own and are ignored. Both
+lists must also validate as ``TradeBase`` rows. Exits non-zero on any
+mismatch.
+
+``--record`` re-sends every fixture's request to the engine configured by
+``MATCHING_ENGINE_URL`` and ``API_KEY`` (through ``TriggerMatch``) and
+stores its answer as the fixture's response.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections import Counter
+from datetime import datetime, time, timezone
+from pathlib import Path
+
+import common  # noqa: F401  puts app/ on sys.path
+
+from modules.local_match import LocalMatch
+from modules.trade_store import trade_rows
+from modules.trigger_match import TriggerMatch
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "engine"
+
+
+def fills(trades) -> Counter:
+    return Counter((str(trade["delivery_day"]), time.fromisoformat(str(trade["timeslot"])).isoformat(),
+                    str(trade["buyer_order_ref"]), str(trade["seller_order_ref"]),
+                    int(trade["quantity"]), float(trade["price"]))
+                   for trade in trades)
+
+
+def compare(fixture) -> list:
+    """Differences between the recorded and the local trades, empty if none."""
+    request = fixture["request"]
+    recorded = fixture["response"]
+    local = LocalMatch().match(request["payload"])
+    problems = []
+    for name, trades in (("recorded", recorded), ("local", local)):
+        try:
+            trade_rows(trades)
+        except Exception as error:
+            problems.append(f"{name} trades do not validate: {error}")
+    expected, got = fills(recorded), fills(local)
+    for fill in sorted(expected - got):
+        problems.append(f"missing locally: {fill}")
+    for fill in sorted(got - expected):
+        problems.append(f"not from the engine: {fill}")
+    return problems
+
+
+async def record(paths, url: str):
+    if url:
+        TriggerMatch.url = url
+    try:
+        for path in paths:
+            fixture = json.loads(path.read_text())
+            request = fixture["request"]
+            fixture["response"] = await TriggerMatch().trigger_matching_engine(request["params"], request["payload"])
+            fixture["source"] = f"recorded from {TriggerMatch.url} at {datetime.now(timezone.utc).isoformat()}"
+            path.write_text(json.dumps(fixture, indent=2) + "\n")
+            print(f"recorded {path.name}: {len(fixture['response'])} trades")
+    finally:
+        await TriggerMatch.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("fixtures", nargs="*", type=Path, help="fixture files (default: all in fixtures/engine)")
+    parser.add_argument("--record", action="store_true", help="refresh the responses from the remote engine first")
+    parser.add_argument("--url", default="", help="engine URL for --record (default: MATCHING_ENGINE_URL)")
+    args = parser.parse_args()
+    paths = args.fixtures or sorted(FIXTURES.glob("*.json"))
+    if not paths:
+        raise SystemExit(f"no fixtures in {FIXTURES}")
+    if args.record:
+        asyncio.run(record(paths, args.url))
+
+    failures = 0
+    for path in paths:
+        fixture = json.loads(path.read_text())
+        problems = compare(fixture)
+        failures += bool(problems)
+        print(f"{'FAIL' if problems else 'ok':<5} {path.stem:<24} {len(fixture['response'])} trades  ({fixture['source']})")
+        for problem in problems:
+            print(f"      {problem}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Assert that the hot dashboard and clearing queries use an index on SQLite.
+
+Builds a scratch database through the Alembic migrations, runs EXPLAIN QUERY
+PLAN on each query and exits non-zero if any of them scans a whole table.
+"""
+import sys
+import tempfile
+from datetime import date, time
+from pathlib import Path
+
+import common  # noqa: F401  puts app/ on sys.path
+
+from sqlalchemy import create_engine, func, select
+
+from models import MarketSummary, Order, Trades
+from modules.clearing import uncleared
+from modules.listing import order_query, trade_query
+
+
+def hot_queries():
+    day = date(2025, 1, 1)
+    return {
+        "dashboard orders by trader": select(Order).where(Order.trader_id == "user_1"),
+        "clearing payload for a day": select(Order).where(Order.delivery_day == day),
+        "open book of changed timeslots": select(Order).where(
+            Order.delivery_day == day,
+            Order.timeslot.in_(select(Order.timeslot).where(Order.delivery_day == day, uncleared(Order)))),
+        "buyer trades": select(Trades).where(Trades.buyer_id == "user_1"),
+        "seller trades": select(Trades).where(Trades.seller_id == "user_1"),
+        "buyer/seller pair": select(Trades).where(Trades.buyer_id == "user_1", Trades.seller_id == "user_2"),
+        "trade listing page": trade_query().limit(1000),
+        "trade listing by day and slot": trade_query(delivery_day=day, timeslot=time(10)).limit(1000),
+        "order listing by trader": order_query(trader_id="user_1").limit(1000),
+        "market data trades by slot": select(Trades.timeslot, func.sum(Trades.quantity))
+            .where(Trades.delivery_day == day).group_by(Trades.timeslot),
+        "market data orders by slot": select(Order.timeslot, Order.order_type, func.sum(Order.quantity))
+            .where(Order.delivery_day == day).group_by(Order.timeslot, Order.order_type),
+        "market data rollup": select(MarketSummary).where(MarketSummary.delivery_day == day),
+        "latest delivery day": select(func.max(Order.delivery_day)),
+    }
+
+
+def query_plan(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect)
+    params = tuple(None for _ in compiled.positiontup or ())
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        import db.db
+        db.db.engine = create_engine(f"sqlite:///{Path(tmp) / 'plans.db'}")
+        db.db.run_migrations()
+
+        failures = 0
+        with db.db.engine.connect() as connection:
+            for name, statement in hot_queries().items():
+                plan = query_plan(connection, statement)
+                scans = [step for step in plan if step.startswith("SCAN") and "INDEX" not in step]
+                failures += bool(scans)
+                print(f"{'FAIL' if scans else 'ok':<5} {name:<32} {' | '.join(plan)}")
+        db.db.engine.dispose()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
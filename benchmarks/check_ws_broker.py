@@ -0,0 +1,90 @@
+"""Cross-worker WebSocket delivery through the Redis broker.
+
+Starts two uvicorn workers on a scratch SQLite database, both pointed at the
+same ``BROKER_URL``. A client on worker A sends to ``/ws/notifications`` and a
+client on worker B must receive every message; delivery latency percentiles
+are printed and the script exits 1 if anything is lost.
+
+    python benchmarks/check_ws_broker.py --redis-url redis://localhost:6379/0
+
+Without ``--redis-url`` an in-process ``fakeredis`` TCP server stands in for
+redis-server (``pip install fakeredis``).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import websockets
+
+from common import free_port, start_server
+
+
+def fake_redis_url() -> str:
+    from fakeredis import TcpFakeServer
+
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def exchange(port_a: int, port_b: int, messages: int):
+    latencies = []
+    async with websockets.connect(f"ws://127.0.0.1:{port_b}/ws/notifications") as receiver, \
+            websockets.connect(f"ws://127.0.0.1:{port_a}/ws/notifications") as sender:
+        await asyncio.sleep(0.2)
+        for index in range(messages):
+            sent = time.perf_counter()
+            await sender.send(f"{index}")
+            while True:
+                try:
+                    message = await asyncio.wait_for(receiver.recv(), 5)
+                except asyncio.TimeoutError:
+                    return latencies
+                if message == f"Notification: {index}":
+                    latencies.append(time.perf_counter() - sent)
+                    break
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url")
+    parser.add_argument("--messages", type=int, default=500)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["BROKER_URL"] = args.redis_url or fake_redis_url()
+    env["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "broker_check.db")
+
+    port_a, port_b = free_port(), free_port()
+    workers = [start_server("main:app", port_a, env)]
+    try:
+        # Started one after the other so their migrations do not race.
+        workers.append(start_server("main:app", port_b, env))
+        latencies = asyncio.run(exchange(port_a, port_b, args.messages))
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.wait()
+
+    print(f"{'delivered across workers':<30} {len(latencies)}/{args.messages}")
+    if latencies:
+        ms = [value * 1000 for value in latencies]
+        for q in (50, 90, 99, 100):
+            print(f"{f'delivery latency p{q}':<30} {percentile(ms, q / 100):8.2f} ms")
+    if len(latencies) != args.messages:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
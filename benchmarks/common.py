@@ -0,0 +1,119 @@
+"""Shared helpers for the benchmark scripts.
+
+Run the scripts from the repository root, e.g. ``python benchmarks/bench_matching.py``;
+the app package is put on ``sys.path`` the same way ``uvicorn main:app`` sees it.
+"""
+import math
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import httpx
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+
+def synthetic_payload(count: int, delivery_day: date = date(2025, 1, 1), slots: int = 24, seed: int = 7):
+    """Clearing payload rows shaped like the ones built in ``trigger_matching_engine``."""
+    rng = random.Random(seed)
+    minutes = 24 * 60 // slots
+    rows = []
+    for _ in range(count):
+        is_buy = rng.random() < 0.5
+        quantity = rng.randint(1, 200)
+        slot = rng.randrange(slots) * minutes
+        rows.append({
+            "order_ref": str(uuid.uuid4()),
+            "common_name": rng.choice(["Utility X", "Utility Y", "Utility Z"] if is_buy else ["Gen A", "Gen B", "Gen C", "Gen D"]),
+            "trader_id": f"user_{rng.randrange(50)}",
+            "order_type": "BUY" if is_buy else "SELL",
+            "quantity": quantity,
+            "price": round(rng.gauss(5000 if is_buy else 4800, 400), 2),
+            "timeslot": f"{slot // 60:02d}:{slot % 60:02d}:00",
+            "delivery_day": str(delivery_day),
+            "max_dispatch": quantity,
+            "quantity_filled": 0,
+            "fully_matched": False,
+        })
+    return rows
+
+
+@contextmanager
+def timed(label: str):
+    start = time.perf_counter()
+    yield
+    print(f"{label:<40} {time.perf_counter() - start:8.3f}s")
+
+
+# Marginal cost per generator (merit order) and size per DisCo, for ``order_book``.
+GENCO_COST = {"Gen A": 4200, "Gen B": 4600, "Gen C": 5100, "Gen D": 5900}
+DISCO_SHARE = {"Utility X": 0.5, "Utility Y": 0.3, "Utility Z": 0.2}
+
+
+def order_book(count: int, delivery_day: date = date(2025, 1, 1), slots: int = 24, seed: int = 7):
+    """``Create`` rows for one delivery day from the ``CommonName`` participants.
+
+    DisCo bids follow the daily load curve (evening peak) with log-normal
+    quantities and a willingness to pay that rises with load; GenCo offers
+    sit around each generator's marginal cost, so the cheaper plants clear
+    first. ``trader_id`` is the participant name in snake case.
+    """
+    rng = random.Random(seed)
+    minutes = 24 * 60 // slots
+    discos, shares = list(DISCO_SHARE), list(DISCO_SHARE.values())
+    rows = []
+    for _ in range(count):
+        slot = rng.randrange(slots)
+        hour = slot * minutes / 60
+        load = 1 + 0.35 * math.exp(-((hour - 19) ** 2) / 8) - 0.2 * math.exp(-((hour - 4) ** 2) / 6)
+        if rng.random() < 0.5:
+            name = rng.choices(discos, shares)[0]
+            order_type = "BUY"
+            price = rng.gauss(5000 * load, 350)
+        else:
+            name = rng.choice(list(GENCO_COST))
+            order_type = "SELL"
+            price = rng.gauss(GENCO_COST[name], 200)
+        quantity = max(1, min(500, int(rng.lognormvariate(3.5, 0.8))))
+        rows.append({
+            "common_name": name,
+            "trader_id": name.lower().replace(" ", "_"),
+            "order_type": order_type,
+            "quantity": quantity,
+            "price": round(max(price, 1), 2),
+            "timeslot": f"{slot * minutes // 60:02d}:{slot * minutes % 60:02d}:00",
+            "delivery_day": str(delivery_day),
+            "max_dispatch": quantity,
+            "quantity_filled": 0,
+        })
+    return rows
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app: str, port: int, env: dict, ready_path: str = "/docs") -> subprocess.Popen:
+    """Run ``uvicorn <app>`` from app/ and wait until ``ready_path`` answers."""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}{ready_path}").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f"{app} on port {port} did not start")
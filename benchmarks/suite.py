@@ -0,0 +1,273 @@
+"""End-to-end benchmark of the order, clearing and listing paths, offline.
+
+Starts the fake matching engine and the app as two uvicorn processes on a
+scratch SQLite database (or ``--database-url``), signs session tokens with a
+throwaway RSA key passed to the app as ``JWT_KEY``, then runs three phases:
+
+- ``submit``: every ``CommonName`` participant posts its share of a synthetic
+  order book (``--orders`` per delivery day, ``--days`` days) through
+  ``create_bid`` / ``create_offer`` in batches of ``--batch``;
+- ``clearing``: ``trigger_matching_engine`` once per day, through
+  ``TriggerMatch`` to the fake engine, timed from the request to the
+  background job finishing, with the job's per-stage timings;
+- ``listing``: the trade, order and market data reads, each hammered by
+  ``--concurrency`` clients for ``--duration`` seconds.
+
+Throughput, latency percentiles and the app's peak memory go to a JSON
+report; pass an earlier report as ``--baseline`` to print the changes:
+
+    python benchmarks/suite.py --output before.json
+    git checkout my-branch
+    python benchmarks/suite.py --output after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, timedelta
+
+import httpx
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from common import APP_DIR, DISCO_SHARE, GENCO_COST, free_port, order_book, start_server
+from load_dashboard import hammer, percentile
+
+# Upcoming days: the in-memory order book behind /depth keeps today and later only.
+FIRST_DAY = date.today() + timedelta(days=1)
+
+
+def signing_keys():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+    return private_key, public_pem
+
+
+def token_for(private_key, trader_id: str) -> str:
+    return jwt.encode({"sub": trader_id, "exp": int(time.time()) + 24 * 3600}, private_key, algorithm="RS256")
+
+
+def memory_mb(pid: int) -> dict:
+    """Current and peak resident memory of a process, from /proc (Linux)."""
+    fields = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                fields[key] = int(value.split()[0]) / 1024
+    return {"rss_mb": round(fields.get("VmRSS", 0), 1), "peak_rss_mb": round(fields.get("VmHWM", 0), 1)}
+
+
+def summary(latencies, count, elapsed, unit) -> dict:
+    ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies),
+        unit: count,
+        "seconds": round(elapsed, 3),
+        f"{unit}_per_second": round(count / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(ms, 0.50), 2),
+        "p90_ms": round(percentile(ms, 0.90), 2),
+        "p99_ms": round(percentile(ms, 0.99), 2),
+        "mean_ms": round(statistics.fmean(ms), 2),
+    }
+
+
+async def submit(client, tokens, args) -> dict:
+    batches = []
+    for offset in range(args.days):
+        rows = order_book(args.orders, FIRST_DAY + timedelta(days=offset), seed=offset)
+        by_trader = {}
+        for row in rows:
+            by_trader.setdefault(row["trader_id"], []).append(row)
+        for trader_id, trader_rows in by_trader.items():
+            route = "/Disco-Dashboard/create_bid" if trader_rows[0]["order_type"] == "BUY" else "/Genco-Dashboard/create_offer"
+            for start in range(0, len(trader_rows), args.batch):
+                batches.append((route, trader_id, trader_rows[start:start + args.batch]))
+
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for batch in batches:
+        queue.put_nowait(batch)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            route, trader_id, rows = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.post(route, json=rows, headers={"Authorization": f"Bearer {tokens[trader_id]}"})
+            latencies.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    result = summary(latencies, args.orders * args.days, time.perf_counter() - start, "orders")
+    result["errors"] = errors
+    return result
+
+
+async def clearing(client, args) -> dict:
+    latencies, trades, errors, stages = [], 0, 0, {}
+    start = time.perf_counter()
+    for offset in range(args.days):
+        started = time.perf_counter()
+        response = await client.post("/tradeclearing/trigger_matching_engine",
+                                     params={"date": str(FIRST_DAY + timedelta(days=offset))})
+        job = response.json() if response.status_code == 202 else {"status": "failed"}
+        while job["status"] in ("queued", "running"):
+            await asyncio.sleep(0.05)
+            job = (await client.get(f"/tradeclearing/jobs/{job['id']}")).json()
+        latencies.append(time.perf_counter() - started)
+        if job["status"] != "succeeded":
+            errors += 1
+            continue
+        trades += job["trades"]
+        for stage, seconds in job["timings"].items():
+            stages[stage] = round(stages.get(stage, 0) + seconds, 6)
+    result = summary(latencies, trades, time.perf_counter() - start, "trades")
+    result["errors"] = errors
+    result["stage_seconds"] = stages
+    return result
+
+
+async def listing(client, tokens, args) -> list:
+    day = str(FIRST_DAY)
+    buyer, seller = next(iter(tokens)), list(tokens)[-1]
+    public = [
+        "/tradeclearing/get_all_trades?limit=1000",
+        f"/tradeclearing/get_all_trades?limit=1000&delivery_day={day}&trader_id={buyer}",
+        "/tradeclearing/bid_offers/?limit=1000",
+        f"/market-data/?delivery_day={day}",
+        f"/market-data/depth/{day}?levels=10",
+    ]
+    authenticated = [
+        (buyer, "/Disco-Dashboard/get_bid"),
+        (buyer, f"/Disco-Dashboard/Trades/x?buyer_id={buyer}"),
+        (seller, "/Genco-Dashboard/get_offer"),
+        (seller, f"/Genco-Dashboard/Trades/x?seller_id={seller}"),
+    ]
+    results = [await hammer(client, path, args.concurrency, args.duration) for path in public]
+    for trader_id, path in authenticated:
+        client.headers["Authorization"] = f"Bearer {tokens[trader_id]}"
+        results.append(await hammer(client, path, args.concurrency, args.duration))
+    client.headers.pop("Authorization", None)
+    return [{key: round(value, 2) if isinstance(value, float) else value for key, value in result.items()}
+            for result in results]
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline: dict):
+    """Print each number next to the baseline's."""
+    def line(label, now, before, key, lower_is_better=True):
+        if before is None or key not in before or not before[key]:
+            return
+        change = (now[key] - before[key]) / before[key] * 100
+        better = change < 0 if lower_is_better else change > 0
+        print(f"  {label:<62} {key:<18} {before[key]:>10} -> {now[key]:>10}  {change:+6.1f}% {'better' if better else 'worse'}")
+
+    print(f"\ncompared with {baseline['meta']['commit']}:")
+    for phase, unit in (("submit", "orders_per_second"), ("clearing", "trades_per_second")):
+        line(phase, report[phase], baseline.get(phase), unit, lower_is_better=False)
+        line(phase, report[phase], baseline.get(phase), "p99_ms")
+    before = {result["path"]: result for result in baseline.get("listing", [])}
+    for result in report["listing"]:
+        line(result["path"], result, before.get(result["path"]), "rps", lower_is_better=False)
+        line(result["path"], result, before.get(result["path"]), "p99_ms")
+    line("app memory", report["memory"], baseline.get("memory"), "peak_rss_mb")
+
+
+async def run(args, base_url: str, app_pid: int) -> dict:
+    private_key, _ = args.keys
+    traders = [name.lower().replace(" ", "_") for name in [*DISCO_SHARE, *GENCO_COST]]
+    tokens = {trader_id: token_for(private_key, trader_id) for trader_id in traders}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        report = {"submit": await submit(client, tokens, args)}
+        report["clearing"] = await clearing(client, args)
+        report["listing"] = await listing(client, tokens, args)
+    report["memory"] = memory_mb(app_pid)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=10000, help="orders per delivery day")
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=200, help="orders per create_bid/create_offer request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per listing endpoint")
+    parser.add_argument("--database-url", help="defaults to a scratch SQLite file")
+    parser.add_argument("--no-cache", action="store_true", help="measure the listings without the response cache")
+    parser.add_argument("--output", default="benchmark-report.json")
+    parser.add_argument("--baseline", help="report from an earlier run to compare against")
+    args = parser.parse_args()
+    args.keys = signing_keys()
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "suite.db"),
+        "MATCHING_ENGINE": "remote",
+        "API_KEY": "benchmark",
+        "JWT_KEY": args.keys[1],
+        "FAKE_MATCH_DELAY": "0",
+        "FAKE_MATCH_FAILURE_RATE": "0",
+    })
+    env.pop("BROKER_URL", None)
+    env.pop("CACHE_URL", None)
+    if args.no_cache:
+        env["CACHE_TTL"] = "0"
+
+    engine_port, app_port = free_port(), free_port()
+    env["MATCHING_ENGINE_URL"] = f"http://127.0.0.1:{engine_port}/v1/match"
+    servers = [start_server("modules.fake_matching_server:app", engine_port, env, ready_path="/v1/faults")]
+    try:
+        servers.append(start_server("main:app", app_port, env))
+        report = asyncio.run(run(args, f"http://127.0.0.1:{app_port}", servers[-1].pid))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    report["meta"] = {
+        "commit": commit(),
+        "run_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "database": "sqlite" if not args.database_url else args.database_url.split(":", 1)[0],
+        "args": {key: value for key, value in vars(args).items() if key not in ("keys", "output", "baseline")},
+    }
+
+    submitted, cleared = report["submit"], report["clearing"]
+    print(f"{'submit':<62} {submitted['orders_per_second']:>10} orders/s  p50 {submitted['p50_ms']} ms"
+          f"  p99 {submitted['p99_ms']} ms  errors {submitted['errors']}")
+    print(f"{'clearing':<62} {cleared['trades_per_second']:>10} trades/s  p50 {cleared['p50_ms']} ms"
+          f"  p99 {cleared['p99_ms']} ms  errors {cleared['errors']}")
+    for result in report["listing"]:
+        print(f"{result['path']:<62} {result['rps']:>10} req/s     p50 {result['p50_ms']} ms"
+              f"  p99 {result['p99_ms']} ms  errors {result['errors']}")
+    print(f"{'app memory':<62} {report['memory']['peak_rss_mb']:>10} MB peak")
+
+    with open(args.output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"report written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as handle:
+            compare(report, json.load(handle))
+
+
+if __name__ == "__main__":
+    main()